@@ -10,6 +10,12 @@ This module is responsible for:
     - Registering REST API routes
     - Creating the Flask application via the `create_app` factory
 
+Flask-Migrate, Flask-Marshmallow, Flask-CORS and the route modules are only
+imported when an application is created, so importing the package stays
+cheap for tools that do not need them. So is the configuration module: its
+classes read the environment when it is imported, which must happen after
+the entry points have loaded their .env file.
+
 Functions:
     - register_extensions(app): Initialize and register Flask extensions.
     - register_error_handlers(app): Register custom error handlers for the app.
@@ -19,17 +25,25 @@ Functions:
 
 import os
 from flask import Flask
-from flask_migrate import Migrate
-from flask_marshmallow import Marshmallow
-from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 
+from .json_provider import OrjsonProvider
 from .models import db
 from .logger import logger
-from .routes import register_routes
 
-# Initialisation des extensions Flask
-migrate = Migrate()
-ma = Marshmallow()
+# Extensions Flask, instanciées une seule fois par processus, à la première
+# création d'application
+migrate = None  # pylint: disable=invalid-name
+ma = None  # pylint: disable=invalid-name
+
+# Error responses with a constant body, serialized once and keyed by status
+# code. The exception's own response is still built per error, for its
+# headers, and as after-request hooks may alter them.
+ERROR_BODIES = {
+    400: b'{"message": "Bad request"}',
+    404: b'{"message": "Resource not found"}',
+    500: b'{"message": "Internal server error"}',
+}
 
 
 def register_extensions(app):
@@ -39,6 +53,15 @@ def register_extensions(app):
     Args:
         app (Flask): The Flask application instance.
     """
+    # pylint: disable=import-outside-toplevel,global-statement
+    global migrate, ma
+    if migrate is None:
+        from flask_migrate import Migrate
+        from flask_marshmallow import Marshmallow
+
+        migrate = Migrate()
+        ma = Marshmallow()
+
     db.init_app(app)
     migrate.init_app(app, db)
     ma.init_app(app)
@@ -52,20 +75,22 @@ def register_error_handlers(app):
     Args:
         app (Flask): The Flask application instance.
     """
-    @app.errorhandler(404)
-    def not_found(_):
-        """Handler for 404 (resource not found) errors."""
-        return {"message": "Resource not found"}, 404
-
-    @app.errorhandler(500)
-    def internal_error(_):
-        """Handler for 500 (internal server) errors."""
-        return {"message": "Internal server error"}, 500
-
-    @app.errorhandler(400)
-    def bad_request(_):
-        """Handler for 400 (bad request) errors."""
-        return {"message": "Bad request"}, 400
+    @app.errorhandler(HTTPException)
+    def http_error(e):
+        """
+        Handler for the HTTP errors, unhandled exceptions included (as 500).
+
+        400, 404 and 500 errors get their constant body; the others, such
+        as 401 and 405, their description. The headers of the exception's
+        own response, such as Allow or WWW-Authenticate, are kept.
+        """
+        response = e.get_response()
+        body = ERROR_BODIES.get(e.code)
+        if body is None:
+            body = app.json.dumps({"message": e.description})
+        response.set_data(body)
+        response.mimetype = 'application/json'
+        return response
 
     logger.info("Error handlers registered successfully.")
 
@@ -80,11 +105,20 @@ def create_app(config_class):
     Returns:
         Flask: The configured and ready-to-use Flask application instance.
     """
+    # pylint: disable=import-outside-toplevel
+    from .config import require_database_url
+    from .routes import register_routes
+
     env = os.getenv('FLASK_ENV')
     logger.info("Creating app in %s environment.", env)
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     app.config.from_object(config_class)
+    logger.setLevel(app.config['LOG_LEVEL'])
+    if not app.config.get('SQLALCHEMY_DATABASE_URI'):
+        app.config['SQLALCHEMY_DATABASE_URI'] = require_database_url()
     if env == 'development':
+        from flask_cors import CORS
         CORS(
             app,
             supports_credentials=True,
@@ -0,0 +1,63 @@
+"""
+bootstrap.py
+------------
+
+Creation of the Flask application by the run.py and wsgi.py entry points.
+
+The .env file of the environment is loaded before `create_app` imports the
+configuration module, whose classes read the environment when imported;
+this module must therefore not import app.config itself.
+
+Functions:
+    - environment_settings(env): .env file and configuration class of an
+      environment.
+    - build_app(env=None): Load the .env file and create the application.
+"""
+
+import os
+from dotenv import load_dotenv
+from . import create_app
+
+# .env file and configuration class of each environment
+ENVIRONMENTS = {
+    'production': ('.env.production', 'app.config.ProductionConfig'),
+    'staging': ('.env.staging', 'app.config.StagingConfig'),
+    'testing': ('.env.test', 'app.config.TestingConfig'),
+}
+DEFAULT_ENVIRONMENT = ('.env.development', 'app.config.DevelopmentConfig')
+
+
+def environment_settings(env):
+    """
+    Select the .env file and configuration class of an environment.
+
+    Args:
+        env (str): The FLASK_ENV value. Unknown values select development.
+
+    Returns:
+        tuple: The .env file path and the configuration class import path.
+    """
+    return ENVIRONMENTS.get(env, DEFAULT_ENVIRONMENT)
+
+
+def build_app(env=None):
+    """
+    Load the .env file of an environment and create the application.
+
+    The .env file is skipped when SKIP_DOTENV=1 (variables injected by the
+    container).
+
+    Args:
+        env (str): The environment; defaults to FLASK_ENV, or development.
+
+    Returns:
+        tuple: The Flask application and its configuration class path.
+    """
+    # Détection de l'environnement
+    env = env or os.environ.get('FLASK_ENV', 'development')
+
+    # Chargement du bon fichier .env, avant l'import de la configuration
+    env_file, config_class = environment_settings(env)
+    if os.environ.get('SKIP_DOTENV') != '1':
+        load_dotenv(env_file)
+    return create_app(config_class), config_class
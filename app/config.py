@@ -12,46 +12,89 @@ Classes:
     - StagingConfig: Configuration for staging.
     - ProductionConfig: Configuration for production.
 
-Each class defines main parameters such as the secret key, database URL,
-debug mode, and SQLAlchemy modification tracking.
+Each class defines main parameters such as the secret key, debug mode,
+SQLAlchemy modification tracking, connection pool options, the password
+hashing method and the log level. The database
+URL is read from the environment by `create_app`, through
+`require_database_url`, once the configuration class has been selected.
 """
 
 import os
+from sqlalchemy.pool import NullPool
+
+
+def require_database_url():
+    """
+    Read the database URL from the DATABASE_URL environment variable.
+
+    Returns:
+        str: The database URL.
+
+    Raises:
+        ValueError: If DATABASE_URL is not set.
+    """
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        raise ValueError("DATABASE_URL environment variable is not set.")
+    return url
 
 
 class Config:
     """Base configuration common to all environments."""
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev')
+    # Set by create_app from DATABASE_URL
+    SQLALCHEMY_DATABASE_URI = None
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Options understood by every pool class, including SQLite's
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+    # werkzeug hashing method for new passwords (werkzeug's default)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    # Worker processes validating large imports (0: validate in the request)
+    IMPORT_VALIDATION_WORKERS = int(
+        os.environ.get('IMPORT_VALIDATION_WORKERS', 0)
+    )
+    # Level of the application logger
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
 
 
 class DevelopmentConfig(Config):
     """Configuration for the development environment."""
     DEBUG = True
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
-    if not SQLALCHEMY_DATABASE_URI:
-        raise ValueError("DATABASE_URL environment variable is not set.")
 
 
 class TestingConfig(Config):
     """Configuration for the testing environment."""
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
-    if not SQLALCHEMY_DATABASE_URI:
-        raise ValueError("DATABASE_URL environment variable is not set.")
+    # No connection reuse between tests (Flask-SQLAlchemy still forces a
+    # StaticPool for in-memory SQLite databases)
+    SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': NullPool}
+    # Cheap hashes, the tests do not need a realistic cost
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    # No per-request INFO records; warnings and errors still show up in
+    # the output of failing tests
+    LOG_LEVEL = 'WARNING'
 
 
 class StagingConfig(Config):
     """Configuration for the staging environment."""
     DEBUG = True
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
-    if not SQLALCHEMY_DATABASE_URI:
-        raise ValueError("DATABASE_URL environment variable is not set.")
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        **Config.SQLALCHEMY_ENGINE_OPTIONS,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    }
 
 
 class ProductionConfig(Config):
     """Configuration for the production environment."""
     DEBUG = False
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
-    if not SQLALCHEMY_DATABASE_URI:
-        raise ValueError("DATABASE_URL environment variable is not set.")
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        **Config.SQLALCHEMY_ENGINE_OPTIONS,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 20)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 40)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    }
@@ -0,0 +1,49 @@
+"""
+json_provider.py
+----------------
+
+JSON serialization for the application, backed by orjson.
+
+Classes:
+    - OrjsonProvider: Flask JSON provider, used by request.get_json and to
+        serialize the dicts and lists returned by the views.
+"""
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider parsing and serializing with orjson.
+
+    Types orjson does not support natively (Decimal, objects with __html__)
+    fall back to the default provider's conversions.
+    """
+
+    def dumps(self, obj, **kwargs):
+        """
+        Serialize data as a JSON string.
+
+        Args:
+            obj: The data to serialize.
+            **kwargs: Ignored, orjson takes no stdlib json options.
+
+        Returns:
+            str: The JSON document.
+        """
+        _ = kwargs
+        return orjson.dumps(obj, default=self.default).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        """
+        Deserialize a JSON document.
+
+        Args:
+            s (str or bytes): The JSON document.
+            **kwargs: Ignored, orjson takes no stdlib json options.
+
+        Returns:
+            The deserialized data.
+        """
+        _ = kwargs
+        return orjson.loads(s)
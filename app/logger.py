@@ -4,10 +4,17 @@ logger.py
 
 This module configures the application logger using the colorlog package.
 It sets up a colored log formatter for improved readability in the console
-and provides a logger instance for use throughout the application.
+and provides the 'app' logger instance for use throughout the application.
+
+Records are handed to a queue by the calling thread; formatting and writing
+to the console happen in a background listener thread, so request handlers
+never block on console I/O.
 """
 
+import atexit
 import logging
+import logging.handlers
+import queue
 import colorlog
 
 handler = colorlog.StreamHandler()
@@ -24,5 +31,19 @@ handler.setFormatter(colorlog.ColoredFormatter(
     }
 ))
 
-logging.basicConfig(level=logging.INFO, handlers=[handler])
-logger = logging.getLogger(__name__)
+log_queue = queue.SimpleQueue()
+queue_handler = logging.handlers.QueueHandler(log_queue)
+# Only merge the message arguments here, colors are added by the listener
+queue_handler.setFormatter(logging.Formatter('%(message)s'))
+listener = logging.handlers.QueueListener(
+    log_queue, handler, respect_handler_level=True
+)
+listener.start()
+atexit.register(listener.stop)
+
+# Only the application's own records go through the colored pipeline; the
+# root logger, and thus third-party libraries, are left untouched
+logger = logging.getLogger('app')
+logger.setLevel(logging.INFO)
+logger.addHandler(queue_handler)
+logger.propagate = False
@@ -6,11 +6,26 @@ This module defines the SQLAlchemy database models for the application.
 """
 import uuid
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import IntegrityError
 
 
 db = SQLAlchemy()
 
 
+def new_user_id():
+    """
+    Generate the ID of a new User: a random UUID as 32 hexadecimal
+    characters.
+
+    Generated in Python rather than by a server-side default, which would
+    need a migration of existing databases and an expression per dialect.
+
+    Returns:
+        str: The new ID.
+    """
+    return uuid.uuid4().hex
+
+
 class User(db.Model):
     """
     Data model for the User entity.
@@ -34,7 +49,7 @@ class User(db.Model):
     """
     __tablename__ = 'users'
 
-    id = db.Column(db.String(40), primary_key=True)
+    id = db.Column(db.String(40), primary_key=True, default=new_user_id)
     email = db.Column(db.String(120), unique=True, nullable=False)
     hashed_passwd = db.Column(db.String(256), nullable=False)
     firstname = db.Column(db.String(80), nullable=True)
@@ -54,6 +69,18 @@ class User(db.Model):
         onupdate=db.func.now()
         )
 
+    # Attributes are read through the instance so that expired ones reload
+    _REPR_FMT = (
+        "<User {0.email}>"
+        " (ID: {0.id}, Email: {0.email}, "
+        "First Name: {0.firstname}, Last Name: {0.lastname}, "
+        "Phone: {0.phone_number}, Active: {0.is_active}, "
+        "Verified: {0.is_verified}, Language: {0.language}, "
+        "Company ID: {0.company_id}, Role ID: {0.role_id}, "
+        "Last Login: {0.last_login_at}, "
+        "Created At: {0.created_at}, Updated At: {0.updated_at})"
+    )
+
     def __repr__(self):
         """
         Return a string representation of the User instance.
@@ -61,16 +88,7 @@ class User(db.Model):
         Returns:
             str: String representation of the User.
         """
-        return (
-            f"<User {self.email}>"
-            f" (ID: {self.id}, Email: {self.email}, "
-            f"First Name: {self.firstname}, Last Name: {self.lastname}, "
-            f"Phone: {self.phone_number}, Active: {self.is_active}, "
-            f"Verified: {self.is_verified}, Language: {self.language}, "
-            f"Company ID: {self.company_id}, Role ID: {self.role_id}, "
-            f"Last Login: {self.last_login_at}, "
-            f"Created At: {self.created_at}, Updated At: {self.updated_at})"
-        )
+        return self._REPR_FMT.format(self)
 
     @classmethod
     def get_all(cls):
@@ -82,6 +100,33 @@ class User(db.Model):
         """
         return cls.query.all()
 
+    @classmethod
+    def get_all_rows(cls, columns=None):
+        """
+        Retrieve all User records as raw rows, without building ORM objects.
+
+        Args:
+            columns (list, optional): Columns to select. Defaults to every
+                exportable column (all but the password hash and timestamps).
+
+        Returns:
+            Result: An iterator over Row tuples, fetched in batches of 1000.
+        """
+        stmt = db.select(*(columns or [
+            cls.id,
+            cls.email,
+            cls.firstname,
+            cls.lastname,
+            cls.phone_number,
+            cls.avatar_url,
+            cls.is_active,
+            cls.is_verified,
+            cls.language,
+            cls.company_id,
+            cls.role_id
+        ]))
+        return db.session.execute(stmt).yield_per(1000)
+
     @classmethod
     def get_by_id(cls, user_id):
         """
@@ -93,7 +138,7 @@ class User(db.Model):
         Returns:
             User: The User object with the given ID, or None if not found.
         """
-        return cls.query.get(user_id)
+        return db.session.get(cls, user_id)
 
     @classmethod
     def get_by_email(cls, email):
@@ -106,7 +151,66 @@ class User(db.Model):
         Returns:
             User: The User object with the given email, or None if not found.
         """
-        return cls.query.filter_by(email=email).first()
+        return db.session.execute(
+            db.select(cls).where(cls.email == email)
+        ).scalar_one_or_none()
+
+    @classmethod
+    def get_id_by_email(cls, email):
+        """
+        Retrieve the ID of the User with the given email, without loading it.
+
+        Args:
+            email (str): Email of the User entity to look up.
+
+        Returns:
+            str: The ID of the User with the given email, or None if not
+                found.
+        """
+        return db.session.execute(
+            db.select(cls.id).where(cls.email == email)
+        ).scalar_one_or_none()
+
+    @classmethod
+    def get_existing_emails(cls, emails):
+        """
+        Retrieve which of the given emails are already used, in one query.
+
+        Args:
+            emails (iterable): Emails to look up.
+
+        Returns:
+            set: The emails that belong to an existing User.
+        """
+        emails = set(emails)
+        if not emails:
+            return set()
+        return set(db.session.execute(
+            db.select(cls.email).where(cls.email.in_(emails))
+        ).scalars())
+
+    @classmethod
+    def get_credentials_by_emails(cls, emails):
+        """
+        Retrieve the ID, password hash and company of several Users by
+        email, in one query and without loading the full records.
+
+        Args:
+            emails (iterable): Emails to look up.
+
+        Returns:
+            dict: (id, hashed_passwd, company_id) tuples keyed by email, for
+                the emails that belong to an existing User.
+        """
+        emails = set(emails)
+        if not emails:
+            return {}
+        rows = db.session.execute(
+            db.select(
+                cls.email, cls.id, cls.hashed_passwd, cls.company_id
+            ).where(cls.email.in_(emails))
+        )
+        return {email: tuple(values) for email, *values in rows}
 
     @classmethod
     def create(
@@ -139,21 +243,17 @@ class User(db.Model):
             language (str, optional): Preferred language of the User.
             company_id (str, optional): Company ID associated with the User.
             role_id (int, optional): Role ID associated with the User.
+            user_id (str, optional): ID of the User. Generated by
+                `new_user_id` when omitted.
 
         Returns:
             User: The newly created User object.
 
         Raises:
-            ValueError: If a user with the given email already exists.
+            IntegrityError: If the INSERT breaks a constraint, such as the
+                unique email. The session is rolled back beforehand.
         """
-        if cls.get_by_email(email):
-            raise ValueError(f"User with email {email} already exists.")
-
-        if not user_id:
-            user_id = uuid.uuid4().hex
-
         user = cls(
-            id=user_id,
             email=email,
             hashed_passwd=hashed_passwd,
             firstname=firstname,
@@ -166,11 +266,52 @@ class User(db.Model):
             company_id=company_id,
             role_id=role_id
         )
+        if user_id:
+            user.id = user_id
 
         db.session.add(user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            raise
         return user
 
+    @classmethod
+    def bulk_values(cls, rows):
+        """
+        Normalize User attribute dicts for a multi-row INSERT.
+
+        Every dict gets the same keys, with the defaults of `create` for the
+        missing optional attributes. IDs are left to the column default.
+
+        Args:
+            rows (list): Dicts of User attributes, as accepted by `create`.
+
+        Returns:
+            list: The column values of each row.
+        """
+        return [
+            {
+                "email": row.get("email"),
+                "hashed_passwd": row.get("hashed_passwd"),
+                "firstname": row.get("firstname"),
+                "lastname": row.get("lastname"),
+                "phone_number": row.get("phone_number"),
+                "avatar_url": row.get("avatar_url"),
+                "is_active": (
+                    True if row.get("is_active") is None
+                    else row["is_active"]
+                ),
+                "is_verified": bool(row.get("is_verified")),
+                "language": row.get("language"),
+                "company_id": row.get("company_id") or 0,
+                "role_id": row.get("role_id") or 0,
+                "last_login_at": row.get("last_login_at"),
+            }
+            for row in rows
+        ]
+
     def update(
         self,
         email=None,
@@ -184,7 +325,8 @@ class User(db.Model):
         language=None,
         company_id=None,
         role_id=None,
-        last_login_at=None
+        last_login_at=None,
+        commit=True
     ):
         """
         Update the attributes of the User entity.
@@ -202,13 +344,13 @@ class User(db.Model):
             company_id (str, optional): New company ID.
             role_id (int, optional): New role ID.
             last_login_at (datetime, optional): New last login datetime.
+            commit (bool, optional): Whether to commit the session. Batch
+                callers pass False and commit once at the end.
 
         Raises:
             ValueError: If the new email is already used by another user.
         """
-        if email is not None:
-            if self.get_by_email(email) and self.email != email:
-                raise ValueError(f"User with email {email} already exists.")
+        if email is not None and email != self.email:
             self.email = email
         if hashed_passwd is not None:
             self.hashed_passwd = hashed_passwd
@@ -233,7 +375,15 @@ class User(db.Model):
         if last_login_at is not None:
             self.last_login_at = last_login_at
 
-        db.session.commit()
+        if commit:
+            new_email = self.email
+            try:
+                db.session.commit()
+            except IntegrityError as e:
+                db.session.rollback()
+                raise ValueError(
+                    f"User with email {new_email} already exists."
+                    ) from e
 
     def delete(self):
         """
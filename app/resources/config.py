@@ -7,10 +7,29 @@ configuration through a REST endpoint.
 """
 
 import os
-from flask_restful import Resource
+from functools import lru_cache
+from flask.views import MethodView
 
 
-class ConfigResource(Resource):
+@lru_cache(maxsize=None)
+def get_config():
+    """
+    Read the exposed configuration from the environment.
+
+    The environment does not change during the life of the process, so the
+    dictionary is built on the first call and reused afterwards.
+
+    Returns:
+        dict: The FLASK_ENV, DEBUG and DATABASE_URI values.
+    """
+    return {
+        "FLASK_ENV": os.getenv("FLASK_ENV"),
+        "DEBUG": os.getenv("DEBUG"),
+        "DATABASE_URI": os.getenv("DATABASE_URI")
+    }
+
+
+class ConfigResource(MethodView):
     """
     Resource for providing the application configuration.
 
@@ -27,9 +46,4 @@ class ConfigResource(Resource):
             dict: A dictionary containing the application configuration and
             HTTP status code 200.
         """
-        config = {
-            "FLASK_ENV": os.getenv("FLASK_ENV"),
-            "DEBUG": os.getenv("DEBUG"),
-            "DATABASE_URI": os.getenv("DATABASE_URI")
-        }
-        return config, 200
+        return get_config(), 200
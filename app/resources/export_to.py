@@ -2,17 +2,17 @@
 export.py
 ---------
 
-This module defines the ExportCSVResource for exporting all Dummy records
+This module defines the ExportCSVResource for exporting all User records
 from the database as a downloadable CSV file through a REST endpoint.
 """
 import io
 import csv
-from flask_restful import Resource
-from flask import make_response
+from flask.views import MethodView
+from flask import Response, stream_with_context
 from app.models import User
 
 
-class ExportCSVResource(Resource):
+class ExportCSVResource(MethodView):
     """
     Resource for exporting data to a CSV file.
 
@@ -23,38 +23,35 @@ class ExportCSVResource(Resource):
 
     def get(self):
         """
-        Export all Dummy records to a CSV file and return it as a response.
+        Export all User records to a CSV file and return it as a response.
+
+        Rows are fetched in batches and each batch is written to the response
+        as one chunk, so the full result set is never held in memory.
 
         Returns:
-            Response: A CSV file containing all Dummy records.
+            Response: A streamed CSV file containing all User records.
         """
-        # Retrieve all Dummy records
-        users = User.get_all()
-
-        # Prepare CSV in memory
-        output = io.StringIO()
-        writer = csv.writer(output)
-        # Write header
-        writer.writerow(["id", "name", "description"])
-        # Write data rows
-        for user in users:
-            writer.writerow([
-                user.id,
-                user.email,
-                user.firstname,
-                user.lastname,
-                user.phone_number,
-                user.avatar_url,
-                user.is_active,
-                user.is_verified,
-                user.language,
-                user.company_id,
-                user.role_id
-                ])
-
-        # Create response
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = (
-                'attachment; filename=export.csv')
-        return response
+        def generate():
+            # Reusable chunk buffer, emptied after each batch
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            rows = User.get_all_rows()
+
+            # Write header
+            writer.writerow(rows.keys())
+            yield buffer.getvalue().encode('utf-8')
+
+            # Write data rows, one batch per chunk
+            for partition in rows.partitions():
+                buffer.seek(0)
+                buffer.truncate(0)
+                writer.writerows(partition)
+                yield buffer.getvalue().encode('utf-8')
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/csv',
+            headers={
+                'Content-Disposition': 'attachment; filename=export.csv'
+            }
+        )
@@ -5,18 +5,315 @@ import.py
 This module defines resources for importing data into the application
 from CSV and JSON files via REST endpoints.
 """
+import codecs
 import csv
-import json
-from flask import request
-from flask_restful import Resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+import ijson
+import orjson
+from flask import current_app, request
+from flask.views import MethodView
 from marshmallow import ValidationError
-from sqlalchemy.exc import SQLAlchemyError
+from marshmallow.experimental.context import Context
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from app.models import User, db
-from app.schemas import UserSchema
+from app.schemas import user_schema, users_schema
 from app.logger import logger
 
+# Number of users written per INSERT statement
+BATCH_SIZE = 1000
 
-class ImportJSONResource(Resource):
+# Request size above which JSON uploads are parsed incrementally
+JSON_STREAMING_THRESHOLD = 10 * 1024 * 1024
+
+# CSV columns holding booleans, and the values read as True
+BOOL_FIELDS = frozenset(("is_active", "is_verified"))
+TRUE_VALUES = frozenset(("true", "1", "yes"))
+
+
+def _import_items(items, label):
+    """
+    Validate and insert user records, batching the writes.
+
+    Records are validated with one many=True load and inserted BATCH_SIZE
+    at a time. An email listed again in the file is rejected as not unique,
+    like an email already in the database. The emails imported so far are
+    carried across batches. Batches validated together by worker processes
+    look up the existing emails before any of them is inserted, so the
+    database alone would not catch these repeats. Records the database
+    rejects are reported as errors. The whole import is committed once at
+    the end.
+
+    Args:
+        items (iterable): Dicts of user attributes, one per record.
+        label (str): Name of the record position in log messages
+            ("index" or "row").
+
+    Returns:
+        tuple: The number of records imported and the list of errors.
+
+    Raises:
+        SQLAlchemyError: If a batch insert or the final commit fails.
+    """
+    count = 0
+    errors = []
+    start = 0
+    # Emails of the records imported so far
+    seen = set()
+    for batch, (loaded, invalid) in _validated_batches(items):
+        # (index, attributes) of the users to insert
+        pending = []
+        for offset, validated in enumerate(loaded):
+            idx = start + offset
+            if offset not in invalid and validated["email"] in seen:
+                invalid[offset] = {"email": ["Email must be unique."]}
+            if offset in invalid:
+                logger.error(
+                    "Validation error at %s %s: %s",
+                    label,
+                    idx,
+                    invalid[offset]
+                    )
+                errors.append({"index": idx, "error": invalid[offset]})
+                continue
+            seen.add(validated["email"])
+            pending.append((idx, validated))
+
+        count += len(pending) - _insert_pending(pending, label, errors)
+        start += len(batch)
+
+    db.session.commit()
+    return count, errors
+
+
+@lru_cache(maxsize=None)
+def _validation_pool(workers):
+    """
+    Return the process pool validating import batches, created on first use.
+
+    Workers are spawned rather than forked, so that they do not inherit the
+    parent's database connections and logging thread.
+
+    Args:
+        workers (int): Number of worker processes.
+
+    Returns:
+        ProcessPoolExecutor: The pool, shared by all imports.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn')
+    )
+
+
+def _validated_batches(items):
+    """
+    Split records into batches and validate them.
+
+    With IMPORT_VALIDATION_WORKERS set above 1, that many batches are read
+    at a time and validated in parallel by worker processes, the existing
+    emails being looked up beforehand in this process, for all of them at
+    once (the caller rejects the emails repeated across them). Imports
+    fitting in a single batch are always validated here.
+
+    Args:
+        items (iterable): Dicts of user attributes, one per record.
+
+    Yields:
+        tuple: Each batch and its `_load_batch` result, in input order.
+    """
+    workers = current_app.config.get('IMPORT_VALIDATION_WORKERS', 0)
+    items = iter(items)
+    while True:
+        batches = [
+            batch for batch in (
+                list(islice(items, BATCH_SIZE))
+                for _ in range(max(workers, 1))
+            ) if batch
+        ]
+        if not batches:
+            break
+        emails = [_existing_emails(batch) for batch in batches]
+        load = _validation_pool(workers).map if len(batches) > 1 else map
+        yield from zip(batches, load(_load_batch, batches, emails))
+
+
+def _existing_emails(batch):
+    """
+    Look up which emails of a batch already exist, in one query.
+
+    Args:
+        batch (list): Dicts of user attributes.
+
+    Returns:
+        set: The emails of the batch used by an existing User.
+    """
+    return User.get_existing_emails(
+        item["email"] for item in batch
+        if isinstance(item, dict) and isinstance(item.get("email"), str)
+    )
+
+
+def _load_batch(batch, existing_emails):
+    """
+    Validate a batch of records with a single many=True load.
+
+    The emails already in the database are looked up by the caller for the
+    whole batch, instead of once per record by the email validator. If a
+    validator fails with anything other than a ValidationError, the batch is
+    validated again record by record, so that the failure is only reported
+    for the records causing it. Uses no database connection, so that it can
+    run in a worker process.
+
+    Args:
+        batch (list): Dicts of user attributes.
+        existing_emails (set): Emails of the batch already in the database.
+
+    Returns:
+        tuple: The loaded records (one per input record, partial for invalid
+            ones) and the errors, keyed by position in the batch.
+    """
+    # The email validator reads the batch's existing emails from the context
+    context = Context({'existing_emails': existing_emails})
+    try:
+        with context:
+            return users_schema.load(batch), {}
+    except ValidationError as e:
+        return e.valid_data, e.messages
+    except Exception:
+        logger.warning("Batch validation failed, retrying record by record.")
+
+    loaded = []
+    invalid = {}
+    for offset, item in enumerate(batch):
+        try:
+            with context:
+                loaded.append(user_schema.load(item))
+        except ValidationError as e:
+            loaded.append(None)
+            invalid[offset] = e.messages
+        except Exception as e:
+            loaded.append(None)
+            invalid[offset] = str(e)
+    return loaded, invalid
+
+
+def _insert_pending(pending, label, errors):
+    """
+    Insert a batch of users, isolating the records the database rejects.
+
+    The batch is written with a single executemany INSERT inside a
+    savepoint. If the database raises an integrity error, the savepoint is
+    rolled back and the users are written one by one, so that only the
+    offending records are reported and skipped.
+
+    Args:
+        pending (list): (index, attributes) tuples of the users to insert.
+        label (str): Name of the record position in log messages.
+        errors (list): List the rejected records are appended to.
+
+    Returns:
+        int: The number of users that could not be written.
+    """
+    if not pending:
+        return 0
+    try:
+        with db.session.begin_nested():
+            db.session.execute(
+                db.insert(User),
+                User.bulk_values([values for _, values in pending])
+            )
+        return 0
+    except IntegrityError:
+        logger.warning("Batch insert failed, retrying record by record.")
+
+    failed = 0
+    for idx, values in pending:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(User), User.bulk_values([values]))
+        except IntegrityError as e:
+            logger.error("Integrity error at %s %s: %s", label, idx, e.orig)
+            errors.append({"index": idx, "error": str(e.orig)})
+            failed += 1
+    return failed
+
+
+def _import_response(count, errors):
+    """
+    Build the endpoint response for an import.
+
+    Args:
+        count (int): Number of records imported.
+        errors (list): Errors encountered during the import.
+
+    Returns:
+        tuple: The response body and HTTP status code.
+    """
+    if errors:
+        logger.warning(
+            "%s errors encountered during import.",
+            len(errors)
+            )
+        return {
+          "message": f"{count} records imported, {len(errors)} errors",
+          "errors": errors
+        }, 400 if count == 0 else 207  # 207: Multi-Status
+
+    return {"message": f"{count} records imported successfully."}, 200
+
+
+def _normalize_json_items(data):
+    """
+    Convert empty JSON string values to None.
+
+    Args:
+        data (iterable): The items of the JSON array.
+
+    Yields:
+        The items of the array, with empty strings set to None in objects.
+    """
+    for item in data:
+        if isinstance(item, dict):
+            # Convert empty strings to None
+            item = {
+                key: None if value == '' else value
+                for key, value in item.items()
+            }
+        yield item
+
+
+def _normalize_csv_rows(reader):
+    """
+    Convert CSV rows to dicts with the types expected by UserSchema.
+
+    Boolean columns are resolved once from the header, instead of going
+    through a DictReader and scanning every row dict.
+
+    Args:
+        reader (csv.reader): The CSV rows, header first.
+
+    Yields:
+        dict: Each row with booleans parsed and empty strings set to None.
+    """
+    header = next(reader, None)
+    if header is None:
+        return
+    is_bool = [name in BOOL_FIELDS for name in header]
+    for row in reader:
+        # Convert string booleans to bool and empty strings to None
+        yield {
+            name: (
+                value.lower() in TRUE_VALUES if boolean
+                else None if value == '' else value
+            )
+            for name, boolean, value in zip(header, is_bool, row)
+        }
+
+
+class ImportJSONResource(MethodView):
     """
     Resource for importing users from a JSON file generated by GET /users.
 
@@ -47,70 +344,34 @@ class ImportJSONResource(Resource):
             return {"message": "No selected file."}, 400
 
         try:
-            data = json.load(file)
-            if not isinstance(data, list):
+            if (request.content_length or 0) < JSON_STREAMING_THRESHOLD:
+                # Small enough to be parsed at once by the C parser
+                data = orjson.loads(file.read())
+                is_list = isinstance(data, list)
+            else:
+                # Parse the array item by item instead of loading it whole
+                events = ijson.parse(file, use_float=True)
+                _, event, _ = next(events)
+                is_list = event == 'start_array'
+                data = ijson.items(events, 'item')
+            if not is_list:
                 logger.error("JSON must be a list of user objects.")
                 return {"message": "JSON must be a list of user objects."}, 400
 
-            count = 0
-            errors = []
-            for idx, item in enumerate(data):
-                # Convert empty strings to None
-                for key, value in item.items():
-                    if value == '':
-                        item[key] = None
-                try:
-                    schema = UserSchema(session=db.session)
-                    schema.context = {}
-                    validated = schema.load(item)
-                    # validated est un objet User (pas un dict)
-                    user = None
-                    if getattr(validated, "id", None):
-                        user = User.get_by_id(validated.id)
-                    if not user and getattr(validated, "email", None):
-                        user = User.get_by_email(validated.email)
-                    if user:
-                        # On update avec les données du dict d'origine (item)
-                        user.update(**item)
-                    else:
-                        User.create(**item)
-                    count += 1
-                except ValidationError as e:
-                    logger.error(
-                        "Validation error at index %s: %s",
-                        idx,
-                        e.messages
-                        )
-                    errors.append({"index": idx, "error": e.messages})
-                except Exception as e:
-                    logger.error(
-                        "Unexpected error at index %s: %s",
-                        idx,
-                        str(e)
-                        )
-                    errors.append({"index": idx, "error": str(e)})
-
-            if errors:
-                logger.warning(
-                    "%s errors encountered during import.",
-                    len(errors)
-                    )
-                return {
-                  "message": f"{count} records imported, {len(errors)} errors",
-                  "errors": errors
-                }, 400 if count == 0 else 207  # 207: Multi-Status
-
-            return {"message": f"{count} records imported successfully."}, 200
-        except (json.JSONDecodeError, TypeError) as e:
-            logger.error("JSON parsing error: %s", str(e))
+            return _import_response(
+                *_import_items(_normalize_json_items(data), "index")
+                )
+        except (orjson.JSONDecodeError, ijson.JSONError, TypeError) as e:
+            logger.error("JSON parsing error: %s", e)
+            db.session.rollback()
             return {"message": f"Invalid JSON file: {str(e)}"}, 400
         except SQLAlchemyError as e:
-            logger.error("Database error: %s", str(e))
+            logger.error("Database error: %s", e)
             db.session.rollback()
             return {"message": f"Database error: {str(e)}"}, 400
 
 
-class ImportCSVResource(Resource):
+class ImportCSVResource(MethodView):
     """
     Resource for importing users from a CSV file generated by
     ExportCSVResource.
@@ -143,66 +404,21 @@ class ImportCSVResource(Resource):
             logger.error("No selected file.")
             return {"message": "No selected file."}, 400
 
+        # Decode the upload incrementally, one line at a time. The lines are
+        # read from the stream itself: before Python 3.11, the
+        # SpooledTemporaryFile holding large uploads cannot be wrapped in a
+        # TextIOWrapper
+        lines = codecs.iterdecode(file.stream, 'utf-8')
         try:
-            # Read CSV file
-            stream = file.stream.read().decode('utf-8').splitlines()
-            reader = csv.DictReader(stream)
-            count = 0
-            errors = []
-            for idx, row in enumerate(reader):
-                # Convert string booleans to bool
-                for bool_field in ["is_active", "is_verified"]:
-                    if bool_field in row:
-                        val = row[bool_field]
-                        if isinstance(val, str):
-                            row[bool_field] = (
-                                val.lower() in ("true", "1", "yes")
-                            )
-                # Convert empty strings to None
-                for key, value in row.items():
-                    if value == '':
-                        row[key] = None
-                try:
-                    schema = UserSchema(session=db.session)
-                    schema.context = {}
-                    validated = schema.load(row)
-                    # validated est un objet User (pas un dict)
-                    user = None
-                    if getattr(validated, "id", None):
-                        user = User.get_by_id(validated.id)
-                    if not user and getattr(validated, "email", None):
-                        user = User.get_by_email(validated.email)
-                    if user:
-                        user.update(**row)
-                    else:
-                        User.create(**row)
-                    count += 1
-                except ValidationError as e:
-                    logger.error(
-                        "Validation error at row %s: %s",
-                        idx,
-                        e.messages
-                        )
-                    errors.append({"index": idx, "error": e.messages})
-                except Exception as e:
-                    logger.error("Unexpected error at row %s: %s", idx, str(e))
-                    errors.append({"index": idx, "error": str(e)})
-
-            if errors:
-                logger.warning(
-                    "%s errors encountered during import.",
-                    len(errors)
-                    )
-                return {
-                  "message": f"{count} records imported, {len(errors)} errors",
-                  "errors": errors
-                }, 400 if count == 0 else 207  # 207: Multi-Status
-
-            return {"message": f"{count} records imported successfully."}, 200
+            reader = csv.reader(lines)
+            return _import_response(
+                *_import_items(_normalize_csv_rows(reader), "row")
+                )
         except (csv.Error, UnicodeDecodeError) as e:
-            logger.error("CSV parsing error: %s", str(e))
+            logger.error("CSV parsing error: %s", e)
+            db.session.rollback()
             return {"message": f"Invalid CSV file: {str(e)}"}, 400
         except SQLAlchemyError as e:
-            logger.error("Database error: %s", str(e))
+            logger.error("Database error: %s", e)
             db.session.rollback()
             return {"message": f"Database error: {str(e)}"}, 400
@@ -4,18 +4,147 @@ resources.py
 This module defines the resources for managing dummy items in the application.
 It includes endpoints for creating, retrieving, updating, and deleting dummy.
 """
-from flask import request
+import orjson
+from flask import Response, request, stream_with_context
+from flask.views import MethodView
 from marshmallow import ValidationError
+from marshmallow.experimental.context import Context
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from flask_restful import Resource
-from werkzeug.security import generate_password_hash
 
 from app.models import db, User
-from app.schemas import UserSchema
+from app.schemas import user_schema
 from app.logger import logger
+from app.utils import hash_password
+
+# Columns returned by GET /users, as dumped by UserSchema (all but the hash)
+_USER_COLUMNS = (
+    User.id,
+    User.email,
+    User.firstname,
+    User.lastname,
+    User.phone_number,
+    User.avatar_url,
+    User.is_active,
+    User.is_verified,
+    User.language,
+    User.company_id,
+    User.role_id,
+    User.last_login_at,
+    User.created_at,
+    User.updated_at,
+)
+
+# Request fields passed on to User.update by PUT and PATCH
+_UPDATABLE_FIELDS = (
+    "email",
+    "hashed_passwd",
+    "firstname",
+    "lastname",
+    "phone_number",
+    "avatar_url",
+    "is_active",
+    "is_verified",
+    "language",
+    "company_id",
+    "role_id",
+)
+
+
+def _user_to_dict(user):
+    """
+    Serialize a user as UserSchema would dump it, without marshmallow.
+
+    The fields are those of _USER_COLUMNS; datetimes are left to the JSON
+    provider, which renders them in ISO 8601 like the schema.
+
+    Args:
+        user (User): The user to serialize.
+
+    Returns:
+        dict: The public attributes of the user.
+    """
+    return {
+        "id": user.id,
+        "email": user.email,
+        "firstname": user.firstname,
+        "lastname": user.lastname,
+        "phone_number": user.phone_number,
+        "avatar_url": user.avatar_url,
+        "is_active": user.is_active,
+        "is_verified": user.is_verified,
+        "language": user.language,
+        "company_id": user.company_id,
+        "role_id": user.role_id,
+        "last_login_at": user.last_login_at,
+        "created_at": user.created_at,
+        "updated_at": user.updated_at,
+    }
+
+
+def _update_kwargs(data):
+    """
+    Select the User.update arguments from validated request data.
 
+    Args:
+        data (dict): The request data.
 
-class UserListResource(Resource):
+    Returns:
+        dict: The updatable fields of the data, without the None values.
+    """
+    return {
+        name: data[name] for name in _UPDATABLE_FIELDS
+        if data.get(name) is not None
+    }
+
+
+def _apply_update(user, data, partial):
+    """
+    Validate request data and apply it to a user, for PUT and PATCH.
+
+    Args:
+        user (User): The user to update.
+        data (dict): The request data. A 'password' field is replaced by its
+            hash.
+        partial (bool): Whether fields may be missing (PATCH).
+
+    Returns:
+        tuple: The serialized updated user and HTTP status code 200 on
+            success.
+        tuple: Error message and HTTP status code 400 or 500 on failure.
+    """
+    # Parsed for this request only: popping the password needs no copy
+    password = data.pop("password", None)
+    if password:
+        data["hashed_passwd"] = hash_password(password)
+
+    try:
+        # The updated user's own email is not a duplicate, and its current
+        # company and role need no new remote check
+        with Context({
+            'user_id': user.id,
+            'current_company_id': user.company_id,
+            'current_role_id': user.role_id
+        }):
+            user_schema.load(data, partial=partial)
+    except ValidationError as err:
+        logger.error("Validation error: %s", err.messages)
+        return {"message": "Validation error", "errors": err.messages}, 400
+
+    try:
+        user.update(**_update_kwargs(data))
+    except (IntegrityError, ValueError) as e:
+        db.session.rollback()
+        logger.error("Integrity error: %s", e)
+        return {"message": "Integrity error", "error": str(e)}, 400
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error("Database error: %s", e)
+        return {"message": "Database error", "error": str(e)}, 500
+
+    return _user_to_dict(user), 200
+
+
+class UserListResource(MethodView):
     """
     Resource for managing the collection of dummy items.
 
@@ -29,18 +158,33 @@ class UserListResource(Resource):
 
     def get(self):
         """
-        Retrieve all dummy items.
+        Retrieve all users.
 
         Returns:
-            tuple: A tuple containing a list of serialized dummy items and the
-            HTTP status code 200.
+            Response: A streamed JSON array of the serialized users, with HTTP
+            status code 200.
         """
         logger.info("Retrieving all users")
 
-        user = User.get_all()
-        user_schemas = UserSchema(session=db.session, many=True)
+        def generate():
+            # Read-only path: plain rows, serialized without going through
+            # UserSchema (datetimes are rendered in ISO 8601 by orjson too)
+            rows = User.get_all_rows(_USER_COLUMNS).mappings()
+
+            # One chunk per batch of rows, so that the list is never held
+            # in memory
+            yield b'['
+            separator = b''
+            for partition in rows.partitions():
+                yield separator + b','.join(
+                    orjson.dumps(dict(row)) for row in partition
+                )
+                separator = b','
+            yield b']\n'
 
-        return user_schemas.dump(user), 200
+        return Response(
+            stream_with_context(generate()), 200, mimetype='application/json'
+        )
 
     def post(self):
         """
@@ -57,20 +201,19 @@ class UserListResource(Resource):
         """
         logger.info("Creating a new user")
 
-        json_data = request.get_json()
-        marshmallow_data = dict(json_data)
+        # Parsed for this request only: popping the password needs no copy
+        marshmallow_data = request.get_json()
         password = marshmallow_data.pop("password", None)
         if not password:
             logger.error("Missing required field 'password'")
             return {"message": "Missing required field 'password'"}, 400
 
-        marshmallow_data["hashed_passwd"] = generate_password_hash(password)
-
-        user_schema = UserSchema(session=db.session)
-        user_schema.context = {}
+        marshmallow_data["hashed_passwd"] = hash_password(password)
 
         try:
-            user_schema.load(marshmallow_data)
+            # Email uniqueness is left to the unique constraint
+            with Context({'skip_uniqueness_precheck': True}):
+                user_schema.load(marshmallow_data)
         except ValidationError as err:
             logger.error("Validation error: %s", err.messages)
             return {"message": "Validation error", "errors": err.messages}, 400
@@ -79,17 +222,24 @@ class UserListResource(Resource):
             user = User.create(**marshmallow_data)
         except IntegrityError as e:
             db.session.rollback()
-            logger.error("Integrity error: %s", str(e))
+            if User.get_id_by_email(marshmallow_data.get("email")):
+                # Email already used: reported like the schema would
+                logger.error("Validation error: email already used")
+                return {
+                    "message": "Validation error",
+                    "errors": {"email": ["Email must be unique."]}
+                }, 400
+            logger.error("Integrity error: %s", e)
             return {"message": "Integrity error", "error": str(e)}, 400
         except SQLAlchemyError as e:
             db.session.rollback()
-            logger.error("Database error: %s", str(e))
+            logger.error("Database error: %s", e)
             return {"message": "Database error", "error": str(e)}, 500
 
-        return user_schema.dump(user), 201
+        return _user_to_dict(user), 201
 
 
-class UserResource(Resource):
+class UserResource(MethodView):
     """
     Resource for managing a single dummy item by its ID.
 
@@ -125,10 +275,7 @@ class UserResource(Resource):
             logger.warning("User with ID %s not found", user_id)
             return {"message": "User not found"}, 404
 
-        user_schema = UserSchema(session=db.session)
-        user_schema.context = {}  # Correction : toujours définir le context
-
-        return user_schema.dump(user), 200
+        return _user_to_dict(user), 200
 
     def put(self, user_id):
         """
@@ -153,52 +300,7 @@ class UserResource(Resource):
             logger.warning("User with ID %s not found", user_id)
             return {"message": "User not found"}, 404
 
-        user_schema = UserSchema(session=db.session)
-        user_schema.context = {'user_id': user.id}
-        json_data = request.get_json()
-        marshmallow_data = dict(json_data)
-        password = marshmallow_data.pop("password", None)
-        if password:
-            marshmallow_data["hashed_passwd"] = (
-                generate_password_hash(password)
-            )
-
-        try:
-            user_schema.load(marshmallow_data)
-        except ValidationError as err:
-            logger.error("Validation error: %s", err.messages)
-            return {"message": "Validation error", "errors": err.messages}, 400
-
-        try:
-            update_kwargs = {
-                "email": marshmallow_data.get("email"),
-                "firstname": marshmallow_data.get("firstname"),
-                "lastname": marshmallow_data.get("lastname"),
-                "phone_number": marshmallow_data.get("phone_number"),
-                "avatar_url": marshmallow_data.get("avatar_url"),
-                "is_active": marshmallow_data.get("is_active"),
-                "is_verified": marshmallow_data.get("is_verified"),
-                "language": marshmallow_data.get("language"),
-                "company_id": marshmallow_data.get("company_id"),
-                "role_id": marshmallow_data.get("role_id"),
-            }
-            if "hashed_passwd" in marshmallow_data:
-                update_kwargs["hashed_passwd"] = (
-                    marshmallow_data["hashed_passwd"]
-                )
-            user.update(
-                **{k: v for k, v in update_kwargs.items() if v is not None}
-                )
-        except IntegrityError as e:
-            db.session.rollback()
-            logger.error("Integrity error: %s", str(e))
-            return {"message": "Integrity error", "error": str(e)}, 400
-        except SQLAlchemyError as e:
-            db.session.rollback()
-            logger.error("Database error: %s", str(e))
-            return {"message": "Database error", "error": str(e)}, 500
-
-        return user_schema.dump(user), 200
+        return _apply_update(user, request.get_json(), partial=False)
 
     def patch(self, user_id):
         """
@@ -223,51 +325,7 @@ class UserResource(Resource):
             logger.warning("User with ID %s not found", user_id)
             return {"message": "User not found"}, 404
 
-        json_data = request.get_json()
-        marshmallow_data = dict(json_data)
-        password = marshmallow_data.pop("password", None)
-        if password:
-            marshmallow_data["hashed_passwd"] = (
-                generate_password_hash(password)
-            )
-
-        user_schema = UserSchema(session=db.session)
-        user_schema.context = {'user_id': user.id}
-        try:
-            user_schema.load(marshmallow_data, partial=True)
-        except ValidationError as err:
-            logger.error("Validation error: %s", err.messages)
-            return {"message": "Validation error", "errors": err.messages}, 400
-
-        update_kwargs = {
-            "email": marshmallow_data.get("email"),
-            "firstname": marshmallow_data.get("firstname"),
-            "lastname": marshmallow_data.get("lastname"),
-            "phone_number": marshmallow_data.get("phone_number"),
-            "avatar_url": marshmallow_data.get("avatar_url"),
-            "is_active": marshmallow_data.get("is_active"),
-            "is_verified": marshmallow_data.get("is_verified"),
-            "language": marshmallow_data.get("language"),
-            "company_id": marshmallow_data.get("company_id"),
-            "role_id": marshmallow_data.get("role_id"),
-        }
-        if "hashed_passwd" in marshmallow_data:
-            update_kwargs["hashed_passwd"] = marshmallow_data["hashed_passwd"]
-
-        try:
-            user.update(
-                **{k: v for k, v in update_kwargs.items() if v is not None}
-                )
-        except IntegrityError as e:
-            db.session.rollback()
-            logger.error("Integrity error: %s", str(e))
-            return {"message": "Integrity error", "error": str(e)}, 400
-        except SQLAlchemyError as e:
-            db.session.rollback()
-            logger.error("Database error: %s", str(e))
-            return {"message": "Database error", "error": str(e)}, 500
-
-        return user_schema.dump(user), 200
+        return _apply_update(user, request.get_json(), partial=True)
 
     def delete(self, user_id):
         """
@@ -291,7 +349,7 @@ class UserResource(Resource):
             user.delete()
         except SQLAlchemyError as e:
             db.session.rollback()
-            logger.error("Database error: %s", str(e))
+            logger.error("Database error: %s", e)
             return {"message": "Database error", "error": str(e)}, 500
 
         return {"message": "User deleted successfully"}, 204
@@ -9,17 +9,134 @@ user credentials and return user information for JWT generation.
 Classes:
     - UserVerifyPasswordResource: Resource for verifying user credentials via
         POST.
+    - UserVerifyPasswordBatchResource: Resource for verifying the
+        credentials of several users in one POST.
+
+Functions:
+    - verify_password(hashed_passwd, password): Checks a password against its
+        hash, caching verdicts for a few seconds.
 """
 
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from cachetools import TTLCache
 from flask import request
-from flask_restful import Resource
+from flask.views import MethodView
+from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.security import check_password_hash
-from app.models import User
-from app.utils import require_internal
+from app.models import User, db
+from app.utils import hash_password, password_needs_rehash, require_internal
 from app.logger import logger
 
+# Recent verdicts, keyed by a digest of the stored hash and the candidate
+# password: a password change thus invalidates them
+_AUTH_CACHE = TTLCache(maxsize=10_000, ttl=5)
+_AUTH_CACHE_LOCK = threading.Lock()
+# Random per-process key, the digests are useless outside this process
+_AUTH_CACHE_KEY = os.urandom(32)
+
+# Maximum number of credentials verified by one batch request
+VERIFY_BATCH_LIMIT = 100
+
+
+def verify_password(hashed_passwd, password):
+    """
+    Check a password against a stored hash, reusing recent verdicts.
+
+    The internal authentication service may verify the same credentials
+    several times within seconds; the hash derivation, which dominates the
+    cost, then only runs once.
+
+    Args:
+        hashed_passwd (str): The stored password hash.
+        password (str): The candidate password.
+
+    Returns:
+        bool: True if the password matches the hash.
+    """
+    key = hashlib.blake2b(
+        f"{hashed_passwd}\0{password}".encode('utf-8'),
+        key=_AUTH_CACHE_KEY,
+        digest_size=16
+    ).digest()
+    with _AUTH_CACHE_LOCK:
+        verdict = _AUTH_CACHE.get(key)
+    if verdict is None:
+        verdict = check_password_hash(hashed_passwd, password)
+        with _AUTH_CACHE_LOCK:
+            _AUTH_CACHE[key] = verdict
+    return verdict
+
+
+@lru_cache(maxsize=None)
+def _verify_pool():
+    """
+    Return the thread pool verifying batched credentials, created on first
+    use.
+
+    The hash derivation runs in hashlib's C code, which releases the GIL,
+    so the verifications of a batch run in parallel on the available cores.
+
+    Returns:
+        ThreadPoolExecutor: The pool, shared by all requests.
+    """
+    return ThreadPoolExecutor(max_workers=os.cpu_count())
+
+
+def _verify_item(user, item):
+    """
+    Verify one credential of a batch.
+
+    Args:
+        user (tuple): The (id, hashed_passwd, company_id) of the user with
+            the credential's email, or None if there is none.
+        item (dict): The credential, with its email and password.
+
+    Returns:
+        dict: The verdict, with the user's ID and company when valid.
+    """
+    email = item["email"]
+    if user is None:
+        logger.error("User with email %s not found", email)
+        return {"email": email, "valid": False}
+    user_id, hashed_passwd, company_id = user
+    # Without a hash, no password can match: nothing to derive
+    if not hashed_passwd or not verify_password(
+        hashed_passwd, item["password"]
+    ):
+        return {"email": email, "valid": False}
+    return {
+        "email": email,
+        "valid": True,
+        "user_id": user_id,
+        "company_id": company_id,
+    }
+
+
+def _rehash_password(user, password):
+    """
+    Replace a user's password hash by one made with the configured method.
+
+    Called once the password is verified, so that hashes made with a weaker
+    method than PASSWORD_HASH_METHOD are migrated as users log in. A failed
+    write is logged and leaves the old hash, which still verifies.
+
+    Args:
+        user (User): The user whose password was verified.
+        password (str): The verified password.
+    """
+    try:
+        user.update(hashed_passwd=hash_password(password))
+        logger.info("Password hash of user %s upgraded", user.email)
+    except (SQLAlchemyError, ValueError) as e:
+        db.session.rollback()
+        logger.error("Could not upgrade password hash of %s: %s", user.email, e)
+
 
-class UserVerifyPasswordResource(Resource):
+class UserVerifyPasswordResource(MethodView):
     """
     Resource for verifying a user's password and returning user info for JWT.
     Endpoint réservé au service d'authentification interne.
@@ -58,11 +175,82 @@ class UserVerifyPasswordResource(Resource):
             logger.error("User with email %s not found", data["email"])
             return {"valid": False}, 404
 
+        if not user.hashed_passwd:
+            # Rien à dériver : aucun mot de passe ne peut correspondre
+            logger.warning("User %s has no password hash", user.email)
+            return {"valid": False}, 401
+
         logger.info("Verifying password for user %s", user.email)
-        if check_password_hash(user.hashed_passwd, data["password"]):
+        if verify_password(user.hashed_passwd, data["password"]):
+            if password_needs_rehash(user.hashed_passwd):
+                _rehash_password(user, data["password"])
             return {
                 "valid": True,
                 "user_id": user.id,
                 "company_id": user.company_id,
             }, 200
         return {"valid": False}, 401
+
+
+class UserVerifyPasswordBatchResource(MethodView):
+    """
+    Resource for verifying the passwords of several users at once.
+    Endpoint réservé au service d'authentification interne.
+
+    The users are looked up with a single query and the passwords are
+    checked in parallel, instead of one request, query and hash derivation
+    after the other.
+    """
+    @require_internal
+    def post(self):
+        """
+        Vérifie les mots de passe de plusieurs utilisateurs.
+
+        Expects:
+            [
+                {"email": "user@example.com", "password": "motdepasse"},
+                ...
+            ]
+            At most VERIFY_BATCH_LIMIT credentials.
+
+        Returns:
+            A list with one verdict per credential, in the request order:
+                {
+                    "email": ...,
+                    "valid": true,
+                    "user_id": ...,
+                    "company_id": ...,
+                }
+            or, for an unknown email or a wrong password:
+                {
+                    "email": ...,
+                    "valid": false
+                }
+        """
+        logger.info("UserVerifyPasswordBatchResource POST called")
+        data = request.get_json()
+        if not isinstance(data, list) or not all(
+            isinstance(item, dict)
+            and isinstance(item.get("email"), str)
+            and isinstance(item.get("password"), str)
+            for item in data
+        ):
+            logger.error("Invalid credentials list in request data")
+            return {
+                "message": "Expected a list of objects with email and password"
+            }, 400
+        if len(data) > VERIFY_BATCH_LIMIT:
+            logger.error("Too many credentials: %s", len(data))
+            return {
+                "message": f"At most {VERIFY_BATCH_LIMIT} credentials per "
+                           "request"
+            }, 400
+
+        users = User.get_credentials_by_emails(
+            item["email"] for item in data
+        )
+        verdicts = _verify_pool().map(
+            lambda item: _verify_item(users.get(item["email"]), item),
+            data
+        )
+        return list(verdicts), 200
@@ -5,12 +5,18 @@ version.py
 This module defines the VersionResource for exposing the current API version
 through a REST endpoint.
 """
-from flask_restful import Resource
+import orjson
+from flask import Response
+from flask.views import MethodView
 
 API_VERSION = "1.0.0"
 
+# The response body never changes, it is serialized once (health checks hit
+# this endpoint frequently)
+VERSION_BODY = orjson.dumps({"version": API_VERSION})
 
-class VersionResource(Resource):
+
+class VersionResource(MethodView):
     """
     Resource for providing the API version.
 
@@ -24,7 +30,7 @@ class VersionResource(Resource):
         Retrieve the current API version.
 
         Returns:
-            dict: A dictionary containing the API version and HTTP status
-            code 200.
+            Response: A JSON response containing the API version, with HTTP
+            status code 200.
         """
-        return {"version": API_VERSION}, 200
+        return Response(VERSION_BODY, 200, mimetype='application/json')
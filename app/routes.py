@@ -5,10 +5,12 @@ Routes for the Flask application.
 # This module is responsible for registering the routes of the REST API
 # and linking them to the corresponding resources.
 """
-from flask_restful import Api
+from flask import Blueprint
 from app.logger import logger
 from app.resources.users import UserResource, UserListResource
-from app.resources.verify import UserVerifyPasswordResource
+from app.resources.verify import (
+    UserVerifyPasswordResource, UserVerifyPasswordBatchResource
+)
 from app.resources.version import VersionResource
 from app.resources.config import ConfigResource
 from app.resources.export_to import ExportCSVResource
@@ -22,20 +24,26 @@ def register_routes(app):
     Args:
         app (Flask): The Flask application instance.
 
-    This function creates a Flask-RESTful Api instance, adds the resource
-    endpoints for managing dummy items, and logs the successful registration
-    of routes.
+    This function creates a Blueprint, adds the class-based views for the
+    user, import/export and service endpoints, registers it on the
+    application and logs the successful registration of routes.
     """
-    api = Api(app)
+    bp = Blueprint('api', __name__)
 
-    api.add_resource(UserListResource, '/users')
-    api.add_resource(UserResource, '/users/<string:user_id>')
-    api.add_resource(UserVerifyPasswordResource, '/users/verify_password')
-    api.add_resource(ExportCSVResource, '/export/csv')
-    api.add_resource(ImportCSVResource, '/import/csv')
-    api.add_resource(ImportJSONResource, '/import/json')
+    # (URL rule, view class), endpoints are named after the lowercased class
+    for rule, view in (
+        ('/users', UserListResource),
+        ('/users/<string:user_id>', UserResource),
+        ('/users/verify_password', UserVerifyPasswordResource),
+        ('/users/verify_password_batch', UserVerifyPasswordBatchResource),
+        ('/export/csv', ExportCSVResource),
+        ('/import/csv', ImportCSVResource),
+        ('/import/json', ImportJSONResource),
+        ('/version', VersionResource),
+        ('/config', ConfigResource),
+    ):
+        bp.add_url_rule(rule, view_func=view.as_view(view.__name__.lower()))
 
-    api.add_resource(VersionResource, '/version')
-    api.add_resource(ConfigResource, '/config')
+    app.register_blueprint(bp)
 
     logger.info("Routes registered successfully.")
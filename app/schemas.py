@@ -7,13 +7,52 @@ the application's data models.
 
 Classes:
     - UserSchema: Schema for serializing and validating User model instances.
+
+Instances:
+    - user_schema: Shared UserSchema, for dumping and loading one user.
+    - users_schema: Shared UserSchema(many=True), for user lists.
+
+Validators read their per-call options from the marshmallow Context set
+around the load, e.g. ``with Context({'user_id': user.id}):``, so the shared
+instances serve every request instead of building a schema per call.
 """
-from datetime import datetime
-from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
-from marshmallow import ValidationError, validates, fields
+from contextvars import ContextVar
+from marshmallow_sqlalchemy import SQLAlchemyAutoSchema, auto_field
+from marshmallow import (
+    ValidationError, validates, validate, fields, pre_load
+)
+from marshmallow.experimental.context import Context
 
 from .models import User
-from .utils import check_company_id, check_role_id
+from .utils import check_company_id, check_role_id, prefetch_checks
+
+# Errors of the ID checks failed by prefetch_references, for the load in
+# progress; set by every load, so never read from a previous one
+_prefetch_errors = ContextVar('prefetch_errors', default=None)
+
+
+def _check_reference(kind, check, value):
+    """
+    Check a company or role ID, reusing the error of a failed prefetch.
+
+    A check that failed (e.g. timed out) during prefetch_references is not
+    cached, so it is not run again for every record holding the ID.
+
+    Args:
+        kind (str): "company" or "role".
+        check (function): check_company_id or check_role_id.
+        value: The ID to check.
+
+    Returns:
+        bool: The result of the check.
+
+    Raises:
+        ValueError: If the check fails, now or during the prefetch.
+    """
+    error = (_prefetch_errors.get() or {}).get((kind, value))
+    if error is not None:
+        raise ValueError(str(error))
+    return check(value)
 
 
 class UserSchema(SQLAlchemyAutoSchema):
@@ -36,6 +75,9 @@ class UserSchema(SQLAlchemyAutoSchema):
         last_login_at (datetime): Last login datetime.
         created_at (datetime): Creation datetime.
         updated_at (datetime): Last update datetime.
+
+    Maximum lengths and boolean types are enforced by the fields generated
+    from the model columns; only the other rules need validators.
     """
     class Meta:
         """
@@ -43,17 +85,70 @@ class UserSchema(SQLAlchemyAutoSchema):
 
         Attributes:
             model: The SQLAlchemy model associated with this schema.
-            load_instance: Whether to load model instances.
+            load_instance: Whether to load model instances. Disabled, so
+                that loading only validates and returns a dict.
             include_fk: Whether to include foreign keys.
             dump_only: Fields that are only used for serialization.
             load_only: Fields that are only used for deserialization.
         """
         model = User
-        load_instance = True
+        load_instance = False
         include_fk = True
         dump_only = ('id', 'created_at', 'updated_at')
         load_only = ('hashed_passwd',)
-        last_login_at = fields.DateTime(allow_none=True)
+
+    # Checked by the fields' own validators, without a schema method call
+    hashed_passwd = auto_field(validate=[
+        validate.Length(min=1, error="Hashed password cannot be empty."),
+        validate.Length(max=256)
+    ])
+    role_id = auto_field(validate=validate.Range(
+        min=0, error="role_id must be a non-negative integer."
+    ))
+
+    # Parsed (and validated) once, by the field itself
+    last_login_at = fields.DateTime(allow_none=True, format='iso')
+
+    @pre_load(pass_collection=True)
+    def prefetch_references(self, data, many, **kwargs):
+        """
+        Check the distinct company and role IDs of the input up front.
+
+        The remote lookups run concurrently and their results are cached,
+        so the company_id and role_id validators neither call the services
+        once per record nor wait for one lookup before starting the other.
+        IDs left unchanged by an update are not checked. The errors of the
+        failed lookups are kept for the validators of this load.
+
+        Args:
+            data: The input data.
+            many (bool): Whether the data is a collection.
+
+        Returns:
+            The input data, unchanged.
+        """
+        _ = kwargs
+        items = data if many else [data]
+        errors = {}
+        if isinstance(items, list):
+            items = [item for item in items if isinstance(item, dict)]
+            context = Context.get({})
+            errors = prefetch_checks(
+                {
+                    item["company_id"] for item in items
+                    if isinstance(item.get("company_id"), str)
+                    and item["company_id"]
+                    != context.get('current_company_id')
+                },
+                {
+                    item["role_id"] for item in items
+                    if isinstance(item.get("role_id"), int)
+                    and not isinstance(item["role_id"], bool)
+                    and item["role_id"] != context.get('current_role_id')
+                }
+            )
+        _prefetch_errors.set(errors)
+        return data
 
     @validates('email')
     def validate_email(self, value, **kwargs):
@@ -74,154 +169,35 @@ class UserSchema(SQLAlchemyAutoSchema):
 
         if not value:
             raise ValidationError("Email cannot be empty.")
-        # Get current user id from schema context if present
-        current_user_id = self.context.get('user_id')
-        email_user = User.query.filter_by(email=value).first()
-        if email_user and (
-           not current_user_id or email_user.id != current_user_id
-           ):
-            raise ValidationError("Email must be unique.")
         if '@' not in value:
             raise ValidationError("Email must contain '@' character.")
         if len(value) > 120:
             raise ValidationError("Email cannot exceed 120 characters.")
-        if not value.strip():
+        # Same as `not value.strip()` for a non-empty string, without
+        # building a copy; stops at the first non-whitespace character
+        if value.isspace():
             raise ValidationError("Email cannot be just whitespace.")
         if not value.isascii():
             raise ValidationError("Email must be ASCII characters only.")
-        return value
-
-    @validates('firstname')
-    def validate_firstname(self, value, **kwargs):
-        """
-        Validate that the first name does not exceed 80 characters.
-
-        Args:
-            value (str): The first name to validate.
-
-        Raises:
-            ValidationError: If the first name exceeds 80 characters.
-
-        Returns:
-            str: The validated first name.
-        """
-        _ = kwargs
-        if value and len(value) > 80:
-            raise ValidationError("First name cannot exceed 80 characters.")
-        return value
-
-    @validates('lastname')
-    def validate_lastname(self, value, **kwargs):
-        """
-        Validate that the last name does not exceed 80 characters.
-
-        Args:
-            value (str): The last name to validate.
-
-        Raises:
-            ValidationError: If the last name exceeds 80 characters.
-
-        Returns:
-            str: The validated last name.
-        """
-        _ = kwargs
-        if value and len(value) > 80:
-            raise ValidationError("Last name cannot exceed 80 characters.")
-        return value
-
-    @validates('phone_number')
-    def validate_phone_number(self, value, **kwargs):
-        """
-        Validate that the phone number does not exceed 20 characters.
-
-        Args:
-            value (str): The phone number to validate.
-
-        Raises:
-            ValidationError: If the phone number exceeds 20 characters.
-
-        Returns:
-            str: The validated phone number.
-        """
-        _ = kwargs
-        if value and len(value) > 20:
-            raise ValidationError("Phone number cannot exceed 20 characters.")
-        return value
-
-    @validates('avatar_url')
-    def validate_avatar_url(self, value, **kwargs):
-        """
-        Validate that the avatar URL does not exceed 256 characters.
-
-        Args:
-            value (str): The avatar URL to validate.
-
-        Raises:
-            ValidationError: If the avatar URL exceeds 256 characters.
 
-        Returns:
-            str: The validated avatar URL.
-        """
-        _ = kwargs
-        if value and len(value) > 256:
-            raise ValidationError("Avatar URL cannot exceed 256 characters.")
-        return value
-
-    @validates('is_active')
-    def validate_is_active(self, value, **kwargs):
-        """
-        Validate that the is_active field is a boolean.
-
-        Args:
-            value (bool): The is_active value to validate.
-
-        Raises:
-            ValidationError: If the value is not a boolean.
-
-        Returns:
-            bool: The validated is_active value.
-        """
-        _ = kwargs
-        if not isinstance(value, bool):
-            raise ValidationError("is_active must be a boolean.")
-        return value
-
-    @validates('is_verified')
-    def validate_is_verified(self, value, **kwargs):
-        """
-        Validate that the is_verified field is a boolean.
-
-        Args:
-            value (bool): The is_verified value to validate.
-
-        Raises:
-            ValidationError: If the value is not a boolean.
-
-        Returns:
-            bool: The validated is_verified value.
-        """
-        _ = kwargs
-        if not isinstance(value, bool):
-            raise ValidationError("is_verified must be a boolean.")
-        return value
-
-    @validates('language')
-    def validate_language(self, value, **kwargs):
-        """
-        Validate that the language does not exceed 10 characters.
-
-        Args:
-            value (str): The language to validate.
-
-        Raises:
-            ValidationError: If the language exceeds 10 characters.
-
-        Returns:
-            str: The validated language.
-        """
-        _ = kwargs
-        if value and len(value) > 10:
-            raise ValidationError("Language cannot exceed 10 characters.")
+        # Uniqueness last: it is the only check needing the database
+        context = Context.get({})
+        existing_emails = context.get('existing_emails')
+        if context.get('skip_uniqueness_precheck'):
+            # Left to the unique constraint, checked by the INSERT itself
+            pass
+        elif existing_emails is not None:
+            # Emails looked up beforehand for a whole batch of records
+            if value in existing_emails:
+                raise ValidationError("Email must be unique.")
+        else:
+            # Get current user id from schema context if present
+            current_user_id = context.get('user_id')
+            email_user_id = User.get_id_by_email(value)
+            if email_user_id and (
+               not current_user_id or email_user_id != current_user_id
+               ):
+                raise ValidationError("Email must be unique.")
         return value
 
     @validates('company_id')
@@ -240,10 +216,11 @@ class UserSchema(SQLAlchemyAutoSchema):
             str: The validated company_id.
         """
         _ = kwargs
-        if not isinstance(value, str):
-            raise ValidationError("company_id must be a string (UUID).")
+        if value == Context.get({}).get('current_company_id'):
+            # Unchanged on update: already checked when it was set
+            return value
         try:
-            if not check_company_id(value):
+            if not _check_reference("company", check_company_id, value):
                 raise ValidationError("Invalid company_id.")
         except ValueError as exc:
             raise ValidationError(str(exc)) from exc
@@ -252,76 +229,33 @@ class UserSchema(SQLAlchemyAutoSchema):
     @validates('role_id')
     def validate_role_id(self, value, **kwargs):
         """
-        Validate that the role_id is a non-negative integer and exists.
+        Validate that the role_id exists.
+
+        Its type and sign are checked by the field beforehand, so invalid
+        values never reach the remote check.
 
         Args:
             value (int): The role_id to validate.
 
         Raises:
-            ValidationError: If the role_id is negative, not an integer,
-                or invalid.
+            ValidationError: If the role_id is zero, invalid, or cannot be
+                checked.
 
         Returns:
             int: The validated role_id.
         """
         _ = kwargs
-        if not isinstance(value, int) or value < 0:
-            raise ValidationError("role_id must be a non-negative integer.")
-        if not check_role_id(value):
-            raise ValidationError("Invalid role_id.")
-
-        return value
-
-    @validates('hashed_passwd')
-    def validate_hashed_passwd(self, value, **kwargs):
-        """
-        Validate that the hashed password is not empty and does not exceed the
-        maximum length.
-
-        Args:
-            value (str): The hashed password to validate.
-
-        Raises:
-            ValidationError: If the hashed password is empty or too long.
-
-        Returns:
-            str: The validated hashed password.
-        """
-        _ = kwargs
-        if not value:
-            raise ValidationError("Hashed password cannot be empty.")
-        if len(value) > 256:
-            raise ValidationError(
-                "Hashed password cannot exceed 256 characters.")
-
+        if value == Context.get({}).get('current_role_id'):
+            # Unchanged on update: already checked when it was set
+            return value
+        try:
+            if not _check_reference("role", check_role_id, value):
+                raise ValidationError("Invalid role_id.")
+        except ValueError as exc:
+            raise ValidationError(str(exc)) from exc
         return value
 
-    @validates('last_login_at')
-    def validate_last_login_at(self, value, **kwargs):
-        """
-        Validate that the last login datetime is a valid datetime or ISO 8601
-        string or None.
-
-        Args:
-            value (datetime, str or None): The last login datetime to validate.
-
-        Raises:
-            ValidationError: If the value is not a valid datetime or ISO 8601
-                string or None.
 
-        Returns:
-            datetime or None: The validated last login datetime.
-        """
-        _ = kwargs
-        if value is not None and not isinstance(value, (str, datetime)):
-            raise ValidationError(
-             "last_login_at must be a valid datetime, ISO8601 string, or None."
-            )
-        if isinstance(value, str):
-            try:
-                datetime.fromisoformat(value)
-            except ValueError as exc:
-                raise ValidationError(
-                    "last_login_at must be a valid ISO8601 datetime string."
-                ) from exc
-        return value
+# Shared instances, built once: the per-call context is set with Context
+user_schema = UserSchema()
+users_schema = UserSchema(many=True)
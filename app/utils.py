@@ -9,18 +9,201 @@ Functions:
         valid UUID and exists in the external company service.
     - check_role_id(role_id): Validates that the given role ID is a positive
         integer and exists in the external role service.
+    - prefetch_checks(company_ids, role_ids): Checks IDs concurrently to
+        fill the lookup caches before a batch validation, and returns the
+        errors of the failed checks.
+    - hash_password(password): Hashes a password with the configured method.
+    - password_needs_rehash(hashed_passwd): Tells whether a hash was made
+        with a weaker method than the configured one.
 
 These functions are used to ensure referential integrity between users and
 external company/role services, and handle environment-specific logic for
-development and testing.
+development and testing. The answers of the services are cached for a
+minute by default. requests is only imported once a service is actually called.
 """
 import os
+import threading
 import uuid
-from functools import wraps
-import requests
-from flask import request, abort
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from cachetools import TTLCache
+from flask import request, abort, current_app
+from werkzeug.security import generate_password_hash
 from .logger import logger
 
+# (connect, read) timeouts of the company and role service calls
+DEFAULT_TIMEOUT = (2, 5)
+
+_cache_lock = threading.Lock()
+
+
+@lru_cache(maxsize=2048)
+def _is_valid_uuid(value):
+    """
+    Tell whether a string is a valid UUID, memoized by string.
+
+    Args:
+        value (str): The string to parse.
+
+    Returns:
+        bool: True if the string parses as a UUID.
+    """
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=None)
+def _http_session():
+    """
+    Return the session used to call the company and role services.
+
+    Connections to the services are kept alive and reused instead of being
+    opened (and TLS-negotiated) for every lookup. The session is created,
+    and requests imported, on first use: development and testing never
+    call the services. SERVICE_POOL_MAXSIZE sets the connections kept per
+    service (default 50).
+
+    Returns:
+        requests.Session: The session, shared by all requests.
+    """
+    # pylint: disable=import-outside-toplevel
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=int(os.environ.get('SERVICE_POOL_MAXSIZE', 50)),
+        # Gateway errors are retried; the last response is still returned
+        max_retries=Retry(
+            total=2,
+            backoff_factor=0.1,
+            status_forcelist=[502, 503, 504],
+            raise_on_status=False
+        )
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# Environments in which company and role IDs are not checked remotely
+SKIP_CHECK_ENVS = frozenset(('development', 'testing'))
+
+
+@lru_cache(maxsize=None)
+def _log_skipped_check(name, env):
+    """
+    Log, once per environment, that a remote ID check is skipped.
+
+    Args:
+        name (str): Name of the checked ID, for the message.
+        env (str): The environment skipping the check.
+    """
+    logger.info("Skipping %s ID check in %s environment", name, env)
+
+
+def _service_url(name):
+    """
+    Read a service URL from the environment.
+
+    The environment is read on each call, so that it can be loaded after
+    this module is imported, but each URL is only validated once.
+
+    Args:
+        name (str): Name of the environment variable.
+
+    Returns:
+        str: The service URL.
+
+    Raises:
+        ValueError: If the variable is not set or is not an HTTP(S) URL.
+    """
+    service = os.getenv(name)
+    if not service:
+        logger.error("%s environment variable is not set.", name)
+        raise ValueError(f"{name} environment variable is not set.")
+    return _validate_service_url(name, service)
+
+
+@lru_cache(maxsize=None)
+def _validate_service_url(name, service):
+    """
+    Check that a service URL uses the HTTP or HTTPS scheme.
+
+    Args:
+        name (str): Name of the environment variable, for messages.
+        service (str): The service URL.
+
+    Returns:
+        str: The service URL.
+
+    Raises:
+        ValueError: If the URL is not an HTTP(S) URL.
+    """
+    if not service.startswith(("http://", "https://")):
+        logger.error("Invalid %s: %s", name, service)
+        raise ValueError(f"{name} must start with 'http://' or 'https://'.")
+    return service
+
+
+@lru_cache(maxsize=None)
+def _lookup_cache(name):
+    """
+    Return the cache of a service's recent lookup results, created on first
+    use.
+
+    Results are keyed by (service URL, ID). Found (200) and not found (404)
+    answers are cached; other statuses and connection errors are not. They
+    are kept VALIDATION_CACHE_TTL seconds (default 60, 0 disables caching).
+
+    Args:
+        name (str): The service, "company" or "role".
+
+    Returns:
+        TTLCache: The cache, shared by all requests.
+    """
+    _ = name
+    return TTLCache(
+        maxsize=4096, ttl=int(os.environ.get('VALIDATION_CACHE_TTL', 60))
+    )
+
+
+def _cached_lookup(cache, key):
+    """
+    Read a cached lookup result.
+
+    Args:
+        cache (TTLCache): The cache to read.
+        key (tuple): The (service URL, ID) key.
+
+    Returns:
+        bool: The cached result, or None if absent or expired.
+    """
+    with _cache_lock:
+        return cache.get(key)
+
+
+def _cache_lookup(cache, key, result):
+    """
+    Store a lookup result.
+
+    Args:
+        cache (TTLCache): The cache to write.
+        key (tuple): The (service URL, ID) key.
+        result (bool): Whether the ID exists.
+
+    Returns:
+        bool: The stored result.
+    """
+    with _cache_lock:
+        cache[key] = result
+    return result
+
 
 def check_company_id(company_id):
     """
@@ -33,36 +216,33 @@ def check_company_id(company_id):
         ValueError: If the company ID is not a valid UUID string.
     """
     # Validate UUID format
-    try:
-        uuid.UUID(company_id)
-    except (ValueError, TypeError) as exc:
-        raise ValueError("Company ID must be a valid UUID string.") from exc
+    if not isinstance(company_id, str) or not _is_valid_uuid(company_id):
+        raise ValueError("Company ID must be a valid UUID string.")
 
     env = os.getenv('FLASK_ENV')
-    if env in ('development', 'testing'):
-        logger.info("Skipping company ID check in %s environment", env)
+    if env in SKIP_CHECK_ENVS:
+        _log_skipped_check("company", env)
         return True
 
-    service = os.getenv("COMPANY_SERVICE_URL")
-    if not service:
-        logger.error("COMPANY_SERVICE_URL environment variable is not set.")
-        raise ValueError(
-            "COMPANY_SERVICE_URL environment variable is not set."
-            )
+    service = _service_url("COMPANY_SERVICE_URL")
 
-    if not service.startswith("http://") and (
-        not service.startswith("https://")
-    ):
-        logger.error("Invalid COMPANY_SERVICE_URL: %s", service)
-        raise ValueError(
-            "COMPANY_SERVICE_URL must start with 'http://' or 'https://'."
-            )
+    cache = _lookup_cache("company")
+    key = (service, company_id)
+    cached = _cached_lookup(cache, key)
+    if cached is not None:
+        return cached
+
+    # pylint: disable-next=import-outside-toplevel
+    from requests import RequestException
 
+    session = _http_session()
     try:
-        response = requests.get(f"{service}/companies/{company_id}", timeout=5)
+        response = session.get(
+            f"{service}/companies/{company_id}", timeout=DEFAULT_TIMEOUT
+        )
         if response.status_code == 404:
             logger.error("Company ID %s not found", company_id)
-            return False
+            return _cache_lookup(cache, key, False)
         if response.status_code != 200:
             logger.error(
                 "Unexpected status code %s for company ID %s",
@@ -70,8 +250,8 @@ def check_company_id(company_id):
             )
             return False
 
-        return True
-    except requests.RequestException as e:
+        return _cache_lookup(cache, key, True)
+    except RequestException as e:
         logger.error("Error checking company ID %s: %s", company_id, e)
         raise ValueError(
             f"Failed to validate company ID {company_id}: {str(e)}"
@@ -97,28 +277,29 @@ def check_role_id(role_id):
         raise ValueError("Role ID must be a positive integer.")
 
     env = os.getenv('FLASK_ENV')
-    if env in ('development', 'testing'):
-        logger.info("Skipping role ID check in %s environment", env)
+    if env in SKIP_CHECK_ENVS:
+        _log_skipped_check("role", env)
         return True
 
-    service = os.getenv("ROLE_SERVICE_URL")
-    if not service:
-        logger.error("ROLE_SERVICE_URL environment variable is not set.")
-        raise ValueError("ROLE_SERVICE_URL environment variable is not set.")
+    service = _service_url("ROLE_SERVICE_URL")
 
-    if not service.startswith("http://") and (
-        not service.startswith("https://")
-    ):
-        logger.error("Invalid ROLE_SERVICE_URL: %s", service)
-        raise ValueError(
-            "ROLE_SERVICE_URL must start with 'http://' or 'https://'."
-            )
+    cache = _lookup_cache("role")
+    key = (service, role_id)
+    cached = _cached_lookup(cache, key)
+    if cached is not None:
+        return cached
 
+    # pylint: disable-next=import-outside-toplevel
+    from requests import RequestException
+
+    session = _http_session()
     try:
-        response = requests.get(f"{service}/roles/{role_id}", timeout=5)
+        response = session.get(
+            f"{service}/roles/{role_id}", timeout=DEFAULT_TIMEOUT
+        )
         if response.status_code == 404:
             logger.error("Role ID %s not found", role_id)
-            return False
+            return _cache_lookup(cache, key, False)
         if response.status_code != 200:
             logger.error(
                 "Unexpected status code %s for role ID %s",
@@ -126,44 +307,194 @@ def check_role_id(role_id):
             )
             return False
 
-        return True
-    except requests.RequestException as e:
+        return _cache_lookup(cache, key, True)
+    except RequestException as e:
         logger.error("Error checking role ID %s: %s", role_id, e)
         raise ValueError(
             f"Failed to validate role ID {role_id}: {str(e)}"
         ) from e
 
 
+def hash_password(password):
+    """
+    Hash a password with the method set in PASSWORD_HASH_METHOD.
+
+    The method defaults to werkzeug's (scrypt); its cost can be lowered by
+    configuration, as the tests do.
+
+    Args:
+        password (str): The plain text password.
+
+    Returns:
+        str: The password hash, as expected by check_password_hash.
+    """
+    return generate_password_hash(
+        password, method=current_app.config['PASSWORD_HASH_METHOD']
+    )
+
+
+@lru_cache(maxsize=None)
+def _hash_prefix(method):
+    """
+    Return the method part of the hashes made with a werkzeug hashing method.
+
+    Methods may leave their parameters to werkzeug's defaults ("scrypt",
+    "pbkdf2"), so the stored form is read from a hash made once per method.
+
+    Args:
+        method (str): The werkzeug hashing method.
+
+    Returns:
+        str: The method as written in its hashes, before the first '$'.
+    """
+    return generate_password_hash("", method=method).split('$', 1)[0]
+
+
+def _hash_strength(prefix):
+    """
+    Rank a werkzeug hashing method, as written in its hashes.
+
+    scrypt ranks above pbkdf2; within a family, methods are ranked by cost
+    (iterations for pbkdf2, n * r * p for scrypt).
+
+    Args:
+        prefix (str): The method part of a hash, such as
+            "pbkdf2:sha256:600000" or "scrypt:32768:8:1".
+
+    Returns:
+        tuple: The family rank and the cost, or None for an unknown method.
+    """
+    family, *params = prefix.split(':')
+    try:
+        if family == 'pbkdf2':
+            return 0, int(params[1])
+        if family == 'scrypt':
+            n, r, p = (int(param) for param in params)
+            return 1, n * r * p
+    except (IndexError, ValueError):
+        pass
+    return None
+
+
+def password_needs_rehash(hashed_passwd):
+    """
+    Tell whether a password hash was made with a weaker method than the one
+    set in PASSWORD_HASH_METHOD.
+
+    Lets hashes made before the method (or its cost) was raised be replaced
+    when the password is next verified. Stronger hashes, and hashes whose
+    method is unknown, are left as they are.
+
+    Args:
+        hashed_passwd (str): The stored password hash.
+
+    Returns:
+        bool: True if the hash should be made again with the configured
+            method.
+    """
+    configured = _hash_strength(
+        _hash_prefix(current_app.config['PASSWORD_HASH_METHOD'])
+    )
+    stored = _hash_strength(hashed_passwd.split('$', 1)[0])
+    return None not in (configured, stored) and stored < configured
+
+
+@lru_cache(maxsize=None)
+def _lookup_pool():
+    """
+    Return the thread pool checking IDs concurrently, created on first use.
+
+    Returns:
+        ThreadPoolExecutor: The pool, shared by all requests.
+    """
+    return ThreadPoolExecutor(max_workers=16)
+
+
+def _try_check(check, value):
+    """
+    Run an ID check, returning its error instead of raising it.
+
+    Args:
+        check (function): check_company_id or check_role_id.
+        value: The ID to check.
+
+    Returns:
+        ValueError: The error raised by the check, or None.
+    """
+    try:
+        check(value)
+    except ValueError as e:
+        return e
+    return None
+
+
+def prefetch_checks(company_ids, role_ids):
+    """
+    Check company and role IDs concurrently, to fill the lookup caches.
+
+    Used before validating a batch of users, so that each distinct ID is
+    looked up once and the lookups overlap, instead of one remote call
+    after the other from the field validators. Failed checks are not
+    cached, so their errors are returned for the validators to report
+    without calling the service again.
+
+    Args:
+        company_ids (set): Distinct company IDs of the batch.
+        role_ids (set): Distinct role IDs of the batch.
+
+    Returns:
+        dict: The ValueError of each failed check, keyed by ("company", ID)
+            or ("role", ID).
+    """
+    if os.getenv('FLASK_ENV') in SKIP_CHECK_ENVS:
+        return {}
+    checks = [("company", check_company_id, value) for value in company_ids]
+    checks += [("role", check_role_id, value) for value in role_ids]
+    if len(checks) <= 1:
+        return {}
+    errors = _lookup_pool().map(
+        lambda check: _try_check(check[1], check[2]), checks
+    )
+    return {
+        (kind, value): error
+        for (kind, _, value), error in zip(checks, errors)
+        if error is not None
+    }
+
+
 def require_internal(f):
     """
     Decorator to ensure that the request is internal (from the same service).
 
+    The environment is read once, when the view is decorated (the views are
+    imported by create_app, after the .env file is loaded), and the wrapper
+    doing only the work needed in that environment is returned.
+
     Args:
         f (function): The function to be decorated.
 
     Returns:
         function: The wrapped function with internal request check.
     """
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        flask_env = os.environ.get('FLASK_ENV')
-        logger.info("FLASK_ENV is set to: %s", flask_env)
-        if not flask_env:
+    flask_env = os.environ.get('FLASK_ENV')
+    logger.debug("FLASK_ENV is set to: %s", flask_env)
+
+    if not flask_env:
+        @wraps(f)
+        def misconfigured(*args, **kwargs):
+            _ = args, kwargs
             logger.error(
                 "FLASK_ENV is not set. Cannot validate internal request."
                 )
             abort(500, description="Server configuration error")
+        return misconfigured
 
-        # Skip internal request check in test and development environments
-        if flask_env in ('test', 'development'):
-            logger.info(
-             "Skipping internal request check in test/development env.")
-            return f(*args, **kwargs)
-
-        # Check for production or staging environments
-        if flask_env in ('production', 'staging'):
-            internal_token = os.environ.get('INTERNAL_REQUEST_SECRET')
+    # Check for production or staging environments
+    if flask_env in ('production', 'staging'):
+        internal_token = os.environ.get('INTERNAL_REQUEST_SECRET')
 
+        @wraps(f)
+        def check_token(*args, **kwargs):
             token = request.headers.get('X-Internal-Token')
             if not token:
                 logger.error("Internal request token is missing.")
@@ -171,6 +502,9 @@ def require_internal(f):
             if token != internal_token:
                 logger.error("Invalid internal request token provided.")
                 abort(401, description="Invalid internal request token")
+            return f(*args, **kwargs)
+        return check_token
 
-        return f(*args, **kwargs)
-    return decorated
+    # No check in the other environments (test, development...)
+    logger.info("Skipping internal request check in %s env.", flask_env)
+    return f
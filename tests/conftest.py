@@ -5,42 +5,159 @@
 import os
 from pytest import fixture
 from dotenv import load_dotenv
+from sqlalchemy import event, insert
+from sqlalchemy.orm import scoped_session, sessionmaker
 from werkzeug.security import generate_password_hash
 
 os.environ['FLASK_ENV'] = 'testing'
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env.test'))
+# Base en mémoire par défaut : Flask-SQLAlchemy lui applique un StaticPool
+# (une seule connexion, check_same_thread désactivé), le schéma n'est créé
+# qu'une fois et aucun test n'écrit sur le disque. Chaque worker
+# pytest-xdist est un processus distinct, avec sa propre base
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
 from app import create_app
+from app.config import TestingConfig
 from app.models import db, User
 
-@fixture
+# Company of the users seeded by the fixtures
+COMPANY_ID = "123e4567-e89b-12d3-a456-426614174000"
+
+@fixture(scope="session")
 def app():
     """
     Fixture to create and configure a Flask application for testing.
-    This fixture sets up the application context, initializes the database,
-    and ensures that the database is created before tests run and dropped after tests complete.
+    The application and its database are created once for the whole test
+    session; each test runs in a transaction rolled back by the `session`
+    fixture. DATABASE_URL may point at a PostgreSQL database instead of the
+    in-memory SQLite default (with -n 0: the workers would share it).
     """
     app = create_app('app.config.TestingConfig')
     with app.app_context():
+        engine = db.engine
+
+        if engine.dialect.name == 'sqlite':
+            # pysqlite n'émet pas de BEGIN avant un SAVEPOINT : on gère
+            # nous-mêmes les transactions pour que le rollback soit effectif.
+            # Pas de durabilité nécessaire : journal en mémoire, sans fsync
+            # (sans effet sur la base en mémoire par défaut)
+            @event.listens_for(engine, "connect")
+            def disable_pysqlite_transactions(dbapi_connection, _):
+                dbapi_connection.isolation_level = None
+                dbapi_connection.execute("PRAGMA journal_mode=MEMORY")
+                dbapi_connection.execute("PRAGMA synchronous=OFF")
+
+            @event.listens_for(engine, "begin")
+            def emit_begin(connection):
+                connection.exec_driver_sql("BEGIN")
+
         db.create_all()
         yield app
         db.drop_all()
 
 @fixture
-def client(app):
-    return app.test_client()
+def session(app):
+    """
+    Fixture binding db.session to a transaction rolled back after the test.
+    Commits made by the application only release savepoints.
+    """
+    connection = db.engine.connect()
+    transaction = connection.begin()
+    original_session = db.session
+    # Plain SQLAlchemy session: Flask-SQLAlchemy's always binds the engine
+    db.session = scoped_session(sessionmaker(
+        bind=connection,
+        join_transaction_mode='create_savepoint'
+    ))
+    yield db.session
+    db.session.remove()
+    db.session = original_session
+    transaction.rollback()
+    connection.close()
 
 @fixture
-def session(app):
-    with app.app_context():
-        yield db.session
+def client(app, session):
+    return app.test_client()
 
 @fixture
-def user():
-    return User.create(
-        email="lengthtest@example.com",
-        hashed_passwd=generate_password_hash("password"),
-        firstname="Test",
-        lastname="User",
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1
+def commit_raises(session):
+    """
+    Fixture returning a function that makes the commits of the test's
+    session raise the given exception, for the database error paths.
+    The exception comes from a before_commit hook, so the session goes
+    through its real commit and rollback; the hook goes away with the
+    test's session.
+    """
+    def apply(exc):
+        def raise_exc(_):
+            raise exc
+        event.listen(session, "before_commit", raise_exc)
+    return apply
+
+@fixture(scope="session")
+def password_hash():
+    """
+    Fixture hashing "password" once for the whole session: the hash, not
+    the INSERT, is the costly part of seeding a user. Uses the cheap method
+    of TestingConfig.
+    """
+    return generate_password_hash(
+        "password", method=TestingConfig.PASSWORD_HASH_METHOD
     )
+
+@fixture(scope="session")
+def user_defaults(password_hash):
+    """
+    Fixture holding the attributes shared by the users seeded by the tests:
+    hashed "password", company and role.
+    """
+    return {
+        'hashed_passwd': password_hash,
+        'company_id': COMPANY_ID,
+        'role_id': 1,
+    }
+
+@fixture
+def user_factory(session, user_defaults):
+    """
+    Fixture returning a function creating a user with User.create, from
+    user_defaults overridden by its keyword arguments.
+    """
+    def make(**overrides):
+        return User.create(**{**user_defaults, **overrides})
+    return make
+
+@fixture
+def user_bulk_factory(session, user_defaults):
+    """
+    Fixture returning a function inserting several users with a single
+    executemany INSERT, instead of one User.create (and commit) per user.
+    Each dict of attributes overrides user_defaults.
+    """
+    def make(*rows):
+        session.execute(
+            insert(User),
+            User.bulk_values([{**user_defaults, **row} for row in rows])
+        )
+        session.commit()
+    return make
+
+@fixture
+def user(session, password_hash):
+    """
+    Fixture inserting a user, rolled back with the test's transaction.
+    The row is written with a Core INSERT ... RETURNING rather than through
+    the ORM unit of work, then loaded once.
+    """
+    user_id = session.execute(
+        insert(User).values(
+            email="lengthtest@example.com",
+            hashed_passwd=password_hash,
+            firstname="Test",
+            lastname="User",
+            company_id=COMPANY_ID,
+            role_id=1
+        ).returning(User.id)
+    ).scalar_one()
+    session.commit()
+    return session.get(User, user_id)
@@ -1,8 +1,48 @@
 import json
+import pytest
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from marshmallow import ValidationError
+from marshmallow.experimental.context import Context
 from werkzeug.security import generate_password_hash
+from app.config import TestingConfig
 from app.models import User, db
-
+from app.resources.users import UserListResource, UserResource
+from app.schemas import UserSchema, user_schema, users_schema
+
+# Hash of "password" for the users seeded by the tests, computed once with
+# the cheap method of TestingConfig
+PASSWORD_HASH = generate_password_hash(
+    "password", method=TestingConfig.PASSWORD_HASH_METHOD
+)
+
+# Company of the users created by the tests. Kept as a string: company_id
+# is a String column and the schema validates strings
+COMPANY_ID = "123e4567-e89b-12d3-a456-426614174000"
+
+# Errors raised by the mocked commits
+INTEGRITY_ERROR = IntegrityError("Mocked IntegrityError", None, None)
+DATABASE_ERROR = SQLAlchemyError("Mocked SQLAlchemyError")
+
+# Body of a valid POST /users request, serialized once for the tests
+# posting it unchanged
+CREATE_BODY = json.dumps({
+    'email': 'user1@example.com',
+    'password': 'password',
+    'firstname': 'Test',
+    'lastname': 'Dummy',
+    'company_id': COMPANY_ID,
+    'role_id': 1,
+    'is_active': True,
+    'is_verified': False
+}).encode('utf-8')
+
+# Body of a POST /users request with a malformed email
+INVALID_EMAIL_BODY = json.dumps({
+    'email': 'not-an-email',
+    'password': 'password',
+    'company_id': COMPANY_ID,
+    'role_id': 1
+}).encode('utf-8')
 
 # Tests for POST /users endpoint
 
@@ -10,24 +50,45 @@ def test_post_user_success(client):
     """
     Test creating a user with all required fields.
     """
-    data = {
-        "email": "user1@example.com",
-        "password": "password",
-        "firstname": "User",
-        "lastname": "One",
-        "company_id": "123e4567-e89b-12d3-a456-426614174000",
-        "role_id": 1,
-        "is_active": True,
-        "is_verified": False
-    }
     response = client.post(
-        "/users",
-        data=json.dumps(data),
-        content_type="application/json"
+        "/users", data=CREATE_BODY, content_type="application/json"
     )
     assert response.status_code == 201
     assert b"user1@example.com" in response.data
 
+def test_post_user_hash_method(client):
+    """
+    Test that the password is hashed with the configured method.
+    """
+    data = {
+        "email": "hashed@example.com",
+        "password": "password",
+        "company_id": COMPANY_ID,
+        "role_id": 1
+    }
+    response = client.post("/users", json=data)
+    assert response.status_code == 201
+    user = User.get_by_email("hashed@example.com")
+    method = client.application.config["PASSWORD_HASH_METHOD"]
+    assert user.hashed_passwd.startswith(method + "$")
+
+def test_post_user_payload_not_shared(client):
+    """
+    Test that popping the password from one request's payload does not
+    affect the next request sending the same body.
+    """
+    body = json.dumps({
+        "email": "twice@example.com",
+        "password": "password",
+        "company_id": COMPANY_ID,
+        "role_id": 1
+    })
+    response = client.post("/users", data=body, content_type="application/json")
+    assert response.status_code == 201
+    response = client.post("/users", data=body, content_type="application/json")
+    assert response.status_code == 400
+    assert b"Missing required field 'password'" not in response.data
+
 def test_post_user_missing_password(client):
     """
     Test creating a user without a password.
@@ -36,14 +97,10 @@ def test_post_user_missing_password(client):
         "email": "user2@example.com",
         "firstname": "User",
         "lastname": "Two",
-        "company_id": "123e4567-e89b-12d3-a456-426614174000",
+        "company_id": COMPANY_ID,
         "role_id": 1
     }
-    response = client.post(
-        "/users",
-        data=json.dumps(data),
-        content_type="application/json"
-    )
+    response = client.post("/users", json=data)
     assert response.status_code == 400
     assert b"Missing required field 'password'" in response.data
 
@@ -51,20 +108,26 @@ def test_post_user_validation_error(client):
     """
     Test creating a user with an invalid email.
     """
-    data = {
-        "email": "not-an-email",
-        "password": "password",
-        "company_id": "123e4567-e89b-12d3-a456-426614174000",
-        "role_id": 1
-    }
     response = client.post(
-        "/users",
-        data=json.dumps(data),
-        content_type="application/json"
+        "/users", data=INVALID_EMAIL_BODY, content_type="application/json"
     )
     assert response.status_code == 400
     assert b"Validation error" in response.data
 
+def test_post_user_invalid_email_skips_lookup(client, monkeypatch):
+    """
+    Test that a malformed email is rejected before the uniqueness lookup.
+    """
+    def fail_lookup(email):
+        raise AssertionError("the database should not be queried")
+
+    monkeypatch.setattr("app.models.User.get_id_by_email", fail_lookup)
+    response = client.post(
+        "/users", data=INVALID_EMAIL_BODY, content_type="application/json"
+    )
+    assert response.status_code == 400
+    assert b"Email must contain '@' character." in response.data
+
 def test_post_user_duplicate_email(client):
     """
     Test creating a user with an already existing email.
@@ -73,71 +136,75 @@ def test_post_user_duplicate_email(client):
     User.create(
         email="user3@example.com",
         hashed_passwd="xxx",
-        company_id="123e4567-e89b-12d3-a456-426614174000",
+        company_id=COMPANY_ID,
         role_id=1
     )
     data = {
         "email": "user3@example.com",
         "password": "password",
-        "company_id": "123e4567-e89b-12d3-a456-426614174000",
+        "company_id": COMPANY_ID,
         "role_id": 1
     }
-    response = client.post(
-        "/users",
-        data=json.dumps(data),
-        content_type="application/json"
-    )
+    response = client.post("/users", json=data)
     assert response.status_code == 400
     assert b"Email must be unique." in response.data
 
-
-def test_creater_integrity_error(client, monkeypatch):
+def test_post_user_duplicate_email_no_precheck(client, user, monkeypatch):
     """
-    Test POST /users with a mocked IntegrityError.
-    This simulates a database integrity error during the creation process.
+    Test that POST leaves email uniqueness to the unique constraint, and
+    still reports a duplicate as a validation error: the email is only
+    looked up once the INSERT has failed.
     """
-    # Fonction qui lève l'exception
-    def raise_integrity_error(*args, **kwargs):
-        raise IntegrityError("Mocked IntegrityError", None, None)
+    lookups = []
+    get_id_by_email = User.get_id_by_email
 
-    # Monkeypatch la méthode commit
-    monkeypatch.setattr("app.models.db.session.commit", raise_integrity_error)
+    def record_lookup(email):
+        lookups.append(email)
+        return get_id_by_email(email)
 
-    data = { 'email': 'user1@example.com',
-             'password': 'password',
-             'firstname': 'Test',
-             'lastname': 'Dummy',
-             'company_id': "123e4567-e89b-12d3-a456-426614174000",
-             'role_id': 1,
-             'is_active': True,
-             'is_verified': False
-           }
-    response = client.post("/users", data=json.dumps(data), content_type="application/json")
+    monkeypatch.setattr("app.models.User.get_id_by_email", record_lookup)
+    data = {
+        "email": user.email,
+        "password": "password",
+        "company_id": COMPANY_ID,
+        "role_id": 1
+    }
+    response = client.post("/users", json=data)
     assert response.status_code == 400
+    assert response.get_json() == {
+        "message": "Validation error",
+        "errors": {"email": ["Email must be unique."]}
+    }
+    assert lookups == [user.email]
 
+    response = client.post("/users", json={**data, "email": "new@example.com"})
+    assert response.status_code == 201
+    assert lookups == [user.email]
 
-def test_create_sqlalchemy_error(client, monkeypatch):
-    """
-    Test POST /users with a mocked SQLAlchemyError.
-    This simulates a database error during the creation process.
-    """
-    def raise_sqlalchemy_error(*args, **kwargs):
-        raise SQLAlchemyError("Mocked SQLAlchemyError")
 
-    monkeypatch.setattr("app.models.db.session.commit", raise_sqlalchemy_error)
 
-    data = { 'email': 'user1@example.com',
-             'password': 'password',
-             'firstname': 'Test',
-             'lastname': 'Dummy',
-             'company_id': "123e4567-e89b-12d3-a456-426614174000",
-             'role_id': 1,
-             'is_active': True,
-             'is_verified': False
-           }
-    response = client.post("/users", data=json.dumps(data), content_type="application/json")
-    assert response.status_code == 500
+@pytest.mark.parametrize("exc, status, message", [
+    (INTEGRITY_ERROR, 400, "Integrity error"),
+    (DATABASE_ERROR, 500, "Database error"),
+])
+def test_create_database_error(
+    app, session, commit_raises, exc, status, message
+):
+    """
+    Test POST /users with a mocked database error on commit: integrity
+    errors other than a duplicate email give a 400 naming them, other
+    database errors a 500.
+    """
+    commit_raises(exc)
 
+    # Error path only: the view is called without the routing and WSGI layers
+    with app.test_request_context(
+        "/users", method="POST", data=CREATE_BODY,
+        content_type="application/json"
+    ):
+        response_body, response_status = UserListResource().post()
+    assert response_status == status
+    assert response_body == {"message": message, "error": str(exc)}
 
 
 # Tests for GET /users endpoint
@@ -150,49 +217,27 @@ def test_get_users_empty(client):
     assert response.status_code == 200
     assert response.json == []
 
-def test_get_users_one(client):
+def test_get_users_one(client, user_factory):
     """
     Test GET /users avec un utilisateur en base.
     """
-    user = User.create(
-        email="user1@example.com",
-        hashed_passwd=generate_password_hash("password"),
-        firstname="User",
-        lastname="One",
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1,
-        is_active=True,
-        is_verified=False
-    )
+    user = user_factory(email="user1@example.com", firstname="User", lastname="One")
     response = client.get("/users")
     assert response.status_code == 200
     users = response.get_json()
     assert isinstance(users, list)
     assert any(u["email"] == "user1@example.com" for u in users)
+    # Same fields as a UserSchema dump, without the password hash
+    assert set(users[0]) == set(UserSchema().dump(user))
+    assert "hashed_passwd" not in users[0]
 
-def test_get_users_multiple(client):
+def test_get_users_multiple(client, user_bulk_factory):
     """
     Test GET /users avec plusieurs utilisateurs.
     """
-    User.create(
-        email="user2@example.com",
-        hashed_passwd=generate_password_hash("password"),
-        firstname="User",
-        lastname="Two",
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1,
-        is_active=True,
-        is_verified=False
-    )
-    User.create(
-        email="user3@example.com",
-        hashed_passwd=generate_password_hash("password"),
-        firstname="User",
-        lastname="Three",
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1,
-        is_active=True,
-        is_verified=False
+    user_bulk_factory(
+        {"email": "user2@example.com", "firstname": "User", "lastname": "Two"},
+        {"email": "user3@example.com", "firstname": "User", "lastname": "Three"}
     )
     response = client.get("/users")
     assert response.status_code == 200
@@ -203,36 +248,23 @@ def test_get_users_multiple(client):
 
 # Tests for PUT /users/<id> endpoint
 
-def test_put_user_success(client):
+def test_put_user_success(client, user_factory):
     """
     Test updating a user with all required fields.
     """
     # Create a user to update
-    user = User.create(
-        email="user1@example.com",
-        hashed_passwd=generate_password_hash("password"),
-        firstname="User",
-        lastname="One",
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1,
-        is_active=True,
-        is_verified=False
-    )
+    user = user_factory(email="user1@example.com", firstname="User", lastname="One")
     data = {
         "email": "user1@example.com",
         "firstname": "Updated",
         "lastname": "User",
         "password": "newpassword",
-        "company_id": "123e4567-e89b-12d3-a456-426614174000",
+        "company_id": COMPANY_ID,
         "role_id": 2,
         "is_active": False,
         "is_verified": True
     }
-    response = client.put(
-        f"/users/{user.id}",
-        data=json.dumps(data),
-        content_type="application/json"
-    )
+    response = client.put(f"/users/{user.id}", json=data)
     assert response.status_code == 200
     assert response.json["firstname"] == "Updated"
     assert response.json["role_id"] == 2
@@ -248,171 +280,57 @@ def test_put_user_not_found(client):
         "firstname": "No",
         "lastname": "User",
         "password": "password",
-        "company_id": "123e4567-e89b-12d3-a456-426614174000",
+        "company_id": COMPANY_ID,
         "role_id": 1
     }
-    response = client.put(
-        "/users/unknownid",
-        data=json.dumps(data),
-        content_type="application/json"
-    )
+    response = client.put("/users/unknownid", json=data)
     assert response.status_code == 404
     assert b"User not found" in response.data
 
-def test_put_user_validation_error(client):
+def test_put_user_validation_error(client, user_factory):
     """
     Test updating a user with invalid data.
     """
-    user = User.create(
-        email="user2@example.com",
-        hashed_passwd=generate_password_hash("password"),
-        firstname="User",
-        lastname="Two",
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1
-    )
+    user = user_factory(email="user2@example.com", firstname="User", lastname="Two")
     data = {
         "email": "not-an-email",
         "firstname": "User",
         "lastname": "Two",
         "password": "password",
-        "company_id": "123e4567-e89b-12d3-a456-426614174000",
+        "company_id": COMPANY_ID,
         "role_id": 1
     }
-    response = client.put(
-        f"/users/{user.id}",
-        data=json.dumps(data),
-        content_type="application/json"
-    )
+    response = client.put(f"/users/{user.id}", json=data)
     assert response.status_code == 400
     assert b"Validation error" in response.data
 
 
-def test_update_integrity_error(client, monkeypatch):
-    """
-    Test PUT /users/<id> with a mocked IntegrityError.
-    This simulates a database integrity error during the update process.
-    """
-    # Fonction qui lève l'exception
-    def raise_integrity_error(*args, **kwargs):
-        raise IntegrityError("Mocked IntegrityError", None, None)
-
-    # First, create a dummy object to update
-    user = User.create(
-        email='user1@example.com',
-        hashed_passwd=generate_password_hash('password'),
-        firstname='Test',
-        lastname='Dummy',
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1,
-        is_active=True,
-        is_verified=False
-    )
-
-    # Monkeypatch la méthode commit
-    monkeypatch.setattr("app.models.db.session.commit", raise_integrity_error)
-
-    data = { 'email': 'user1@example.com',
-             'password': 'password',
-             'firstname': 'foo',
-             'lastname': 'bar',
-             'company_id': "123e4567-e89b-12d3-a456-426614174000",
-             'role_id': 1,
-             'is_active': True,
-             'is_verified': False
-           }
-    response = client.put(
-        f"/users/{user.id}",
-        data=json.dumps(data),
-        content_type="application/json"
-        )
-    assert response.status_code == 400
-
-
-def test_update_sqlalchemy_error(client, monkeypatch):
-    """
-    Test PUT /dummies/<id> with a mocked SQLAlchemyError.
-    This simulates a database error during the update process.
-    """
-    def raise_sqlalchemy_error(*args, **kwargs):
-        raise SQLAlchemyError("Mocked SQLAlchemyError")
-
-    # First, create a dummy object to update
-    user = User.create(
-        email='user1@example.com',
-        hashed_passwd=generate_password_hash('password'),
-        firstname='Test',
-        lastname='Dummy',
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1,
-        is_active=True,
-        is_verified=False
-    )
-
-    monkeypatch.setattr("app.models.db.session.commit", raise_sqlalchemy_error)
-
-    data = { 'email': 'user1@example.com',
-             'password': 'password',
-             'firstname': 'foo',
-             'lastname': 'bar',
-             'company_id': "123e4567-e89b-12d3-a456-426614174000",
-             'role_id': 1,
-             'is_active': True,
-             'is_verified': False
-           }
-    response = client.put(f"/users/{user.id}", data=json.dumps(data), content_type="application/json")
-    assert response.status_code == 500
-
 # Tests for PATCH /dummies/<id> endpoint
 
-def test_patch_user_success(client):
+def test_patch_user_success(client, user_factory):
     """
     Test partially updating a user with valid fields.
     """
     # Create a user to update
-    user = User.create(
-        email="patchuser@example.com",
-        hashed_passwd=generate_password_hash("password"),
-        firstname="Patch",
-        lastname="User",
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1,
-        is_active=True,
-        is_verified=False
-    )
+    user = user_factory(email="patchuser@example.com", firstname="Patch", lastname="User")
     patch_data = {
         "firstname": "Patched",
         "is_active": False
     }
-    response = client.patch(
-        f"/users/{user.id}",
-        data=json.dumps(patch_data),
-        content_type="application/json"
-    )
+    response = client.patch(f"/users/{user.id}", json=patch_data)
     assert response.status_code == 200
     assert response.json["firstname"] == "Patched"
     assert response.json["is_active"] is False
 
-def test_patch_user_password(client):
+def test_patch_user_password(client, user_factory):
     """
     Test partially updating a user's password.
     """
-    user = User.create(
-        email="patchpass@example.com",
-        hashed_passwd=generate_password_hash("oldpassword"),
-        firstname="Patch",
-        lastname="Pass",
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1
-    )
+    user = user_factory(email="patchpass@example.com", firstname="Patch", lastname="Pass")
     patch_data = {
         "password": "newpassword"
     }
-    response = client.patch(
-        f"/users/{user.id}",
-        data=json.dumps(patch_data),
-        content_type="application/json"
-    )
+    response = client.patch(f"/users/{user.id}", json=patch_data)
     assert response.status_code == 200
     # Optionally, check that the password was actually changed (hash differs)
     assert response.json["email"] == "patchpass@example.com"
@@ -424,204 +342,112 @@ def test_patch_user_not_found(client):
     patch_data = {
         "firstname": "Ghost"
     }
-    response = client.patch(
-        "/users/unknownid",
-        data=json.dumps(patch_data),
-        content_type="application/json"
-    )
+    response = client.patch("/users/unknownid", json=patch_data)
     assert response.status_code == 404
     assert b"User not found" in response.data
 
-def test_patch_user_validation_error(client):
+def test_patch_user_validation_error(client, user_factory):
     """
     Test patching a user with invalid data.
     """
-    user = User.create(
-        email="patchval@example.com",
-        hashed_passwd=generate_password_hash("password"),
-        firstname="Patch",
-        lastname="Val",
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1
-    )
+    user = user_factory(email="patchval@example.com", firstname="Patch", lastname="Val")
     patch_data = {
         "email": "not-an-email"
     }
-    response = client.patch(
-        f"/users/{user.id}",
-        data=json.dumps(patch_data),
-        content_type="application/json"
-    )
+    response = client.patch(f"/users/{user.id}", json=patch_data)
     assert response.status_code == 400
     assert b"Validation error" in response.data
 
-def test_partial_update_integrity_error(client, monkeypatch):
+@pytest.mark.parametrize("method", ["put", "patch"])
+@pytest.mark.parametrize("exc, status", [
+    (INTEGRITY_ERROR, 400),
+    (DATABASE_ERROR, 500),
+])
+def test_update_database_error(app, user, commit_raises, method, exc, status):
     """
-    Test PATCH /users/<id> with a mocked IntegrityError.
-    This simulates a database integrity error during the update process.
+    Test PUT and PATCH /users/<id> with a mocked database error on commit:
+    integrity errors give a 400, other database errors a 500.
     """
-    # Fonction qui lève l'exception
-    def raise_integrity_error(*args, **kwargs):
-        raise IntegrityError("Mocked IntegrityError", None, None)
+    commit_raises(exc)
 
-    # First, create a user object to update
-    user = User.create(
-        email='user1@example.com',
-        hashed_passwd=generate_password_hash('password'),
-        firstname='Test',
-        lastname='Dummy',
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1,
-        is_active=True,
-        is_verified=False
-    )
-
-    # Monkeypatch la méthode commit
-    monkeypatch.setattr("app.models.db.session.commit", raise_integrity_error)
-
-    response = client.patch(f'/users/{user.id}', json={'email': 'updated@example.com'})
-    assert response.status_code == 400
-
-
-def test_partial_update_sqlalchemy_error(client, monkeypatch):
-    """
-    Test PATCH /users/<id> with a mocked SQLAlchemyError.
-    This simulates a database error during the update process.
-    """
-    def raise_sqlalchemy_error(*args, **kwargs):
-        raise SQLAlchemyError("Mocked SQLAlchemyError")
-
-    user = User.create(
-        email='user1@example.com',
-        hashed_passwd=generate_password_hash('password'),
-        firstname='Test',
-        lastname='Dummy',
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1,
-        is_active=True,
-        is_verified=False
-    )
-
-    monkeypatch.setattr("app.models.db.session.commit", raise_sqlalchemy_error)
-
-    response = client.patch(f'/users/{user.id}', json={'email': 'updated@example.com'})
-    assert response.status_code == 500
-
-def test_user_schema_patch_fields(client):
-    """
-    Test PATCH /users/<id> with valid and invalid values for each UserSchema field.
-    """
-    # Crée un utilisateur de base
-    user = User.create(
-        email="schemauser@example.com",
-        hashed_passwd=generate_password_hash("password"),
-        firstname="Schema",
-        lastname="User",
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1,
-        is_active=True,
-        is_verified=False
-    )
-    user_id = user.id
-
-    # Champs à tester : {champ: (valide, invalide)}
-    fields = {
-        "email": ("ok@example.com", "not-an-email"),
-        "firstname": ("John", "J"*81),
-        "lastname": ("Doe", "D"*81),
-        "phone_number": ("0123456789", "1"*21),
-        "avatar_url": ("http://img.com/a.png", "a"*257),
-        "is_active": (True, "notabool"),
-        "is_verified": (False, "notabool"),
-        "language": ("en", "x"*11),
-        "company_id": ("123e4567-e89b-12d3-a456-426614174000", "not-a-uuid"),
-        "role_id": (1, -1),
-        "hashed_passwd": (generate_password_hash("newpass"), ""),  # direct hash
-        "last_login_at": ("2023-01-01T12:00:00", "not-a-date"),
-    }
-
-    for field, (good, bad) in fields.items():
-        # PATCH avec valeur valide
-        resp = client.patch(
-            f"/users/{user_id}",
-            data=json.dumps({field: good}),
-            content_type="application/json"
-        )
-        assert resp.status_code == 200, f"{field} valid value should pass"
-
-        # PATCH avec valeur invalide
-        resp = client.patch(
-            f"/users/{user_id}",
-            data=json.dumps({field: bad}),
-            content_type="application/json"
-        )
-        assert resp.status_code == 400, f"{field} invalid value should fail"
-        assert b"Validation error" in resp.data
-
-def test_patch_firstname_too_long(client, user):
-    data = {"firstname": "A" * 81}
-    resp = client.patch(f"/users/{user.id}", data=json.dumps(data), content_type="application/json")
-    assert resp.status_code == 400
-    assert b"Longer than maximum length 80." in resp.data
-
-def test_patch_lastname_too_long(client, user):
-    data = {"lastname": "B" * 81}
-    resp = client.patch(f"/users/{user.id}", data=json.dumps(data), content_type="application/json")
-    assert resp.status_code == 400
-    assert b"Longer than maximum length 80." in resp.data
-
-def test_patch_phone_number_too_long(client, user):
-    data = {"phone_number": "1" * 21}
-    resp = client.patch(f"/users/{user.id}", data=json.dumps(data), content_type="application/json")
-    assert resp.status_code == 400
-    assert b"Longer than maximum length 20." in resp.data
-
-def test_patch_avatar_url_too_long(client, user):
-    data = {"avatar_url": "h" * 257}
-    resp = client.patch(f"/users/{user.id}", data=json.dumps(data), content_type="application/json")
-    assert resp.status_code == 400
-    assert b"Longer than maximum length 256." in resp.data
-
-def test_patch_language_too_long(client, user):
-    data = {"language": "l" * 11}
-    resp = client.patch(f"/users/{user.id}", data=json.dumps(data), content_type="application/json")
-    assert resp.status_code == 400
-    assert b"Longer than maximum length 10." in resp.data
-
-def test_patch_email_too_long(client, user):
-    data = {"email": ("a" * 120) + "@ex.com"}
-    resp = client.patch(f"/users/{user.id}", data=json.dumps(data), content_type="application/json")
-    assert resp.status_code == 400
-    assert b"Longer than maximum length 120." in resp.data
-
-def test_patch_hashed_passwd_too_long(client, user):
-    data = {"hashed_passwd": "x" * 257}
-    resp = client.patch(f"/users/{user.id}", data=json.dumps(data), content_type="application/json")
-    assert resp.status_code == 400
-    assert b"Longer than maximum length 256." in resp.data
-
-# Tests for DELETE /dummies/<id> endpoint
-
-def test_delete_user_success(client):
-    """
-    Test DELETE /users/<id> should delete the user.
-    """
     data = { 'email': 'user1@example.com',
              'password': 'password',
-             'firstname': 'Test',
-             'lastname': 'Dummy',
-             'company_id': "123e4567-e89b-12d3-a456-426614174000",
+             'firstname': 'foo',
+             'lastname': 'bar',
+             'company_id': COMPANY_ID,
              'role_id': 1,
              'is_active': True,
              'is_verified': False
            }
-    post_resp = client.post("/users", data=json.dumps(data), content_type="application/json")
-    user_id = post_resp.json["id"]
+    with app.test_request_context(
+        f"/users/{user.id}", method=method.upper(), json=data
+    ):
+        _, response_status = getattr(UserResource(), method)(user.id)
+    assert response_status == status
+
+# Champs à tester : (champ, valide, invalide)
+PATCH_FIELD_CASES = [
+    ("email", "ok@example.com", "not-an-email"),
+    ("firstname", "John", "J"*81),
+    ("lastname", "Doe", "D"*81),
+    ("phone_number", "0123456789", "1"*21),
+    ("avatar_url", "http://img.com/a.png", "a"*257),
+    ("is_active", True, "notabool"),
+    ("is_verified", False, "notabool"),
+    ("language", "en", "x"*11),
+    ("company_id", COMPANY_ID, "not-a-uuid"),
+    ("role_id", 1, -1),
+    ("hashed_passwd", PASSWORD_HASH, ""),  # direct hash
+    ("last_login_at", "2023-01-01T12:00:00", "not-a-date"),
+]
+
+@pytest.mark.parametrize("field, good, bad", PATCH_FIELD_CASES)
+def test_user_schema_patch_fields(client, user, field, good, bad):
+    """
+    Test PATCH /users/<id> with a valid and an invalid value for each
+    UserSchema field.
+    """
+    # PATCH avec valeur valide
+    resp = client.patch(f"/users/{user.id}", json={field: good})
+    assert resp.status_code == 200, f"{field} valid value should pass"
+
+    # PATCH avec valeur invalide
+    resp = client.patch(f"/users/{user.id}", json={field: bad})
+    assert resp.status_code == 400, f"{field} invalid value should fail"
+    assert b"Validation error" in resp.data
+
+@pytest.mark.parametrize("field, value, message", [
+    ("firstname", "A" * 81, "Longer than maximum length 80."),
+    ("lastname", "B" * 81, "Longer than maximum length 80."),
+    ("phone_number", "1" * 21, "Longer than maximum length 20."),
+    ("avatar_url", "h" * 257, "Longer than maximum length 256."),
+    ("language", "l" * 11, "Longer than maximum length 10."),
+    ("email", ("a" * 120) + "@ex.com", "Longer than maximum length 120."),
+    ("hashed_passwd", "x" * 257, "Longer than maximum length 256."),
+    ("hashed_passwd", "", "Hashed password cannot be empty."),
+    ("role_id", -1, "role_id must be a non-negative integer."),
+    ("role_id", 0, "Role ID must be a positive integer."),
+])
+def test_patch_field_invalid(app, user, field, value, message):
+    # Validation only: the view is called without the routing and WSGI layers
+    with app.test_request_context(
+        f"/users/{user.id}", method="PATCH", json={field: value}
+    ):
+        body, status = UserResource().patch(user.id)
+    assert status == 400
+    assert message in body["errors"][field]
+
+# Tests for DELETE /dummies/<id> endpoint
+
+def test_delete_user_success(client, user):
+    """
+    Test DELETE /users/<id> should delete the user.
+    """
+    user_id = user.id
     response = client.delete(f"/users/{user_id}")
     assert response.status_code == 204
     # Should not be found anymore
-    get_resp = client.get(f"/users/{user_id}")
-    assert get_resp.status_code == 404
+    assert db.session.get(User, user_id) is None
 
 def test_delete_users_not_found(client):
     """
@@ -631,38 +457,23 @@ def test_delete_users_not_found(client):
     assert response.status_code == 404
     assert response.json["message"] == "User not found"
 
-def test_delete_sqlalchemy_error(client, monkeypatch):
+def test_delete_sqlalchemy_error(app, user, commit_raises):
     """
     Test DELETE /users/<id> with a mocked SQLAlchemyError.
     This simulates a database error during the deletion process.
     """
-    def raise_sqlalchemy_error(*args, **kwargs):
-        raise SQLAlchemyError("Mocked SQLAlchemyError")
-
-    # First, create a user object to delete (avec tous les champs obligatoires)
-    user = User.create(
-        email='user1@example.com',
-        hashed_passwd=generate_password_hash('password'),
-        firstname='Test',
-        lastname='Dummy',
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1,
-        is_active=True,
-        is_verified=False
-    )
+    commit_raises(DATABASE_ERROR)
 
-    monkeypatch.setattr("app.models.db.session.commit", raise_sqlalchemy_error)
-
-    response = client.delete(f'/users/{user.id}')
-    assert response.status_code == 500
-    data = json.loads(response.data)
+    with app.test_request_context(f"/users/{user.id}", method="DELETE"):
+        data, status = UserResource().delete(user.id)
+    assert status == 500
     assert 'message' in data
     assert 'error' in data
     assert data['message'] == 'Database error'
 
 
 
-def test_model_repr(app):
+def test_model_repr(app, session):
     """
     Test the __repr__ method of the User model.
     """
@@ -670,10 +481,10 @@ def test_model_repr(app):
 
     user = User.create(
         email='user1@example.com',
-        hashed_passwd=generate_password_hash('password'),
+        hashed_passwd=PASSWORD_HASH,
         firstname='Test',
         lastname='Dummy',
-        company_id="123e4567-e89b-12d3-a456-426614174000",
+        company_id=COMPANY_ID,
         role_id=1,
         is_active=True,
         is_verified=False
@@ -686,3 +497,153 @@ def test_model_repr(app):
     f"Created At: {user.created_at}, Updated At: {user.updated_at})"
     )
     assert repr(user) == expected_repr, f"Expected: {expected_repr}, got: {repr(user)}"
+
+
+def test_model_generated_id(session):
+    """
+    Test that a 32 hex characters ID is generated when none is given to
+    User.create.
+    """
+    user = User.create(
+        email='serverid@example.com',
+        hashed_passwd=PASSWORD_HASH,
+        company_id=COMPANY_ID,
+        role_id=1
+    )
+    assert len(user.id) == 32
+    int(user.id, 16)
+    assert User.get_by_id(user.id) is user
+
+
+def test_model_generated_id_bulk_insert(user_bulk_factory):
+    """
+    Test that users inserted with a single executemany INSERT each get
+    their own generated ID.
+    """
+    user_bulk_factory({"email": "bulk1@example.com"}, {"email": "bulk2@example.com"})
+    ids = {user.id for user in User.get_all()}
+    assert len(ids) == 2
+    assert all(len(user_id) == 32 for user_id in ids)
+
+
+def test_model_create_duplicate_email(app, user):
+    """
+    Test that User.create reports a duplicate email through the unique
+    constraint, and leaves the session usable.
+    """
+    with pytest.raises(IntegrityError):
+        User.create(email=user.email, hashed_passwd="xxx")
+    assert User.get_by_email(user.email).id == user.id
+
+
+def test_get_user_not_found(client):
+    """
+    Test GET /users/<id> with an unknown id should return 404.
+    """
+    response = client.get("/users/unknown-id")
+    assert response.status_code == 404
+    assert response.json["message"] == "User not found"
+
+
+def test_get_user_matches_schema_dump(client, user):
+    """
+    Test that GET /users/<id> returns the same document as a UserSchema
+    dump of the user.
+    """
+    response = client.get(f"/users/{user.id}")
+    assert response.status_code == 200
+    assert response.get_json() == UserSchema().dump(user)
+
+
+def test_user_schema_context_per_call(app, user):
+    """
+    Test that the shared schema reads its validation options from the
+    Context around the load, and only there.
+    """
+    data = {
+        "email": user.email,
+        "hashed_passwd": "x" * 60,
+        "company_id": COMPANY_ID,
+        "role_id": 1
+    }
+    with Context({'existing_emails': {user.email}}):
+        with pytest.raises(ValidationError):
+            user_schema.load(data)
+    with Context({'user_id': user.id}):
+        assert user_schema.load(data)["email"] == user.email
+    with pytest.raises(ValidationError):
+        user_schema.load(data)
+
+
+def test_patch_user_unchanged_references_not_checked(client, user, monkeypatch):
+    """
+    Test that PATCH does not check again the company_id and role_id the
+    user already has.
+    """
+    def fail_check(value):
+        raise AssertionError("the reference should not be checked")
+
+    monkeypatch.setattr("app.schemas.check_company_id", fail_check)
+    monkeypatch.setattr("app.schemas.check_role_id", fail_check)
+    data = {
+        "firstname": "Unchanged",
+        "company_id": user.company_id,
+        "role_id": user.role_id
+    }
+    response = client.patch(f"/users/{user.id}", json=data)
+    assert response.status_code == 200
+    assert response.get_json()["firstname"] == "Unchanged"
+
+
+def test_user_schema_prefetches_single_record(session, monkeypatch):
+    """
+    Test that loading one user prefetches its company and role together,
+    leaving out those unchanged by an update.
+    """
+    prefetched = []
+    monkeypatch.setattr(
+        "app.schemas.prefetch_checks",
+        lambda company_ids, role_ids: prefetched.append((company_ids, role_ids))
+    )
+    data = {
+        "email": "new@example.com",
+        "hashed_passwd": "x" * 60,
+        "company_id": COMPANY_ID,
+        "role_id": 2
+    }
+    with Context({'skip_uniqueness_precheck': True}):
+        user_schema.load(data)
+    with Context({'current_company_id': COMPANY_ID, 'current_role_id': 1}):
+        user_schema.load(data, partial=True)
+    assert prefetched == [({COMPANY_ID}, {2}), (set(), {2})]
+
+
+def test_user_schema_reuses_prefetch_errors(session, monkeypatch, requests_mock):
+    """
+    Test that a company lookup failing during the prefetch is reported for
+    every record holding the ID, without calling the service again.
+    """
+    from requests.exceptions import ConnectTimeout
+
+    monkeypatch.setenv("FLASK_ENV", "production")
+    monkeypatch.setenv("COMPANY_SERVICE_URL", "http://company-prefetch")
+    monkeypatch.setenv("ROLE_SERVICE_URL", "http://role-prefetch")
+    company_call = requests_mock.get(
+        f"http://company-prefetch/companies/{COMPANY_ID}", exc=ConnectTimeout
+    )
+    requests_mock.get("http://role-prefetch/roles/2", status_code=200)
+    data = [
+        {
+            "email": f"prefetch{i}@example.com",
+            "hashed_passwd": "x" * 60,
+            "company_id": COMPANY_ID,
+            "role_id": 2
+        }
+        for i in range(2)
+    ]
+    with pytest.raises(ValidationError) as excinfo:
+        with Context({'skip_uniqueness_precheck': True}):
+            users_schema.load(data)
+    assert set(excinfo.value.messages) == {0, 1}
+    assert all("company_id" in error for error in excinfo.value.messages.values())
+    assert company_call.call_count == 1
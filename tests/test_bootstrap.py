@@ -0,0 +1,75 @@
+"""
+test_bootstrap.py
+-----------------
+This module contains tests for the application bootstrap shared by the run.py
+and wsgi.py entry points: the configuration class and .env file selected from
+the FLASK_ENV environment variable.
+"""
+import pytest
+from app import bootstrap
+
+@pytest.mark.parametrize("env,expected_config", [
+    ("production", "app.config.ProductionConfig"),
+    ("staging", "app.config.StagingConfig"),
+    ("testing", "app.config.TestingConfig"),
+    ("development", "app.config.DevelopmentConfig"),
+    ("unknown", "app.config.DevelopmentConfig"),
+])
+
+
+def test_build_app_config_class(monkeypatch, env, expected_config):
+    """
+    Test that build_app selects the correct configuration class based on
+    the environment.
+
+    This test patches load_dotenv and create_app to avoid side effects,
+    builds the application for the environment, and checks that the correct
+    config class is passed to create_app.
+    """
+    # Patch load_dotenv to avoid loading real .env files
+    monkeypatch.setattr(bootstrap, "load_dotenv", lambda *args, **kwargs: None)
+
+    captured = {}
+    def fake_create_app(config_class):
+        captured["config_class"] = config_class
+        class DummyApp:
+            pass
+        return DummyApp()
+    monkeypatch.setattr(bootstrap, "create_app", fake_create_app)
+
+    _, config_class = bootstrap.build_app(env)
+
+    assert config_class == expected_config
+    assert "config_class" in captured, f"create_app was not called for env={env}"
+    assert captured["config_class"] == expected_config
+
+
+def test_build_app_skip_dotenv(monkeypatch):
+    """
+    Test that build_app does not load a .env file when SKIP_DOTENV is set
+    to 1.
+    """
+    loaded = []
+    monkeypatch.setattr(bootstrap, "load_dotenv", loaded.append)
+    monkeypatch.setattr(bootstrap, "create_app", lambda config_class: object())
+    monkeypatch.setenv("SKIP_DOTENV", "1")
+
+    bootstrap.build_app("production")
+
+    assert not loaded
+
+
+def test_environment_settings():
+    """
+    Test that each environment selects its .env file and configuration
+    class, unknown ones falling back to development.
+    """
+    assert bootstrap.environment_settings("production") == (
+        ".env.production", "app.config.ProductionConfig"
+    )
+    assert bootstrap.environment_settings("testing") == (
+        ".env.test", "app.config.TestingConfig"
+    )
+    assert bootstrap.environment_settings("unknown") == (
+        ".env.development", "app.config.DevelopmentConfig"
+    )
@@ -5,7 +5,6 @@ This module contains tests for the /config endpoint to ensure it returns the
 expected configuration values.
 """
 
-import json
 
 def test_config_endpoit(client):
     """
@@ -14,8 +13,9 @@ def test_config_endpoit(client):
     response = client.get('/config')
     assert response.status_code == 200
 
-    data = json.loads(response.data)
+    data = response.get_json()
     assert isinstance(data, dict)
     assert "FLASK_ENV" in data
     assert "DEBUG" in data
     assert "DATABASE_URI" in data
+
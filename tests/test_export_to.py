@@ -23,3 +23,16 @@ def test_export_csv_empty(client):
     content = response.data.decode('utf-8')
     # Should at least contain headers
     assert "id" in content  # Adapt to your CSV headers
+
+def test_export_csv_rows(client, user):
+    """
+    Test that the /export/csv endpoint streams one line per user after the
+    header.
+    """
+    response = client.get('/export/csv')
+    assert response.status_code == 200
+    lines = response.data.decode('utf-8').splitlines()
+    assert lines[0].startswith("id,email,firstname,lastname")
+    assert len(lines) == 2
+    assert user.id in lines[1]
+    assert user.email in lines[1]
@@ -1,34 +1,47 @@
 import io
 import json
+import pytest
+
+# Company of the imported users
+COMPANY_ID = "123e4567-e89b-12d3-a456-426614174000"
+
+# Upload contents, encoded once for the tests sending them unchanged
+USERS_JSON = json.dumps([
+    {
+        "email": "user1@example.com",
+        "firstname": "User",
+        "lastname": "One",
+        "hashed_passwd": "x" * 60,
+        "company_id": COMPANY_ID,
+        "role_id": 1,
+        "is_active": True,
+        "is_verified": False
+    },
+    {
+        "email": "user2@example.com",
+        "firstname": "User",
+        "lastname": "Two",
+        "hashed_passwd": "y" * 60,
+        "company_id": COMPANY_ID,
+        "role_id": 1,
+        "is_active": True,
+        "is_verified": False
+    }
+]).encode("utf-8")
+NOT_A_LIST_JSON = json.dumps({"email": "user@example.com"}).encode("utf-8")
+
+CSV_HEADER = "email,firstname,lastname,hashed_passwd,company_id,role_id,is_active,is_verified\n"
+USERS_CSV = (
+    CSV_HEADER +
+    f"user1@example.com,User,One,{'x' * 56},{COMPANY_ID},1,True,False\n"
+    f"user2@example.com,User,Two,{'y' * 56},{COMPANY_ID},1,True,False\n"
+).encode("utf-8")
 
 def test_import_json_success(client):
     """
     Test importing valid JSON data via /import/json.
     """
-    data = [
-        {
-            "email": "user1@example.com",
-            "firstname": "User",
-            "lastname": "One",
-            "hashed_passwd": "x" * 60,
-            "company_id": "123e4567-e89b-12d3-a456-426614174000",
-            "role_id": 1,
-            "is_active": True,
-            "is_verified": False
-        },
-        {
-            "email": "user2@example.com",
-            "firstname": "User",
-            "lastname": "Two",
-            "hashed_passwd": "y" * 60,
-            "company_id": "123e4567-e89b-12d3-a456-426614174000",
-            "role_id": 1,
-            "is_active": True,
-            "is_verified": False
-        }
-    ]
-    file_data = io.BytesIO(json.dumps(data).encode("utf-8"))
-    file_data.seek(0)
+    file_data = io.BytesIO(USERS_JSON)
     response = client.post(
         "/import/json",
         data={"file": (file_data, "users.json")},
@@ -75,7 +88,7 @@ def test_import_json_not_a_list(client):
     """
     Test importing with a JSON file that is not a list.
     """
-    file_data = io.BytesIO(json.dumps({"email": "user@example.com"}).encode("utf-8"))
+    file_data = io.BytesIO(NOT_A_LIST_JSON)
     response = client.post(
         "/import/json",
         data={"file": (file_data, "users.json")},
@@ -94,7 +107,7 @@ def test_import_json_partial_success(client):
             "firstname": "User",
             "lastname": "One",
             "hashed_passwd": "x" * 60,
-            "company_id": "123e4567-e89b-12d3-a456-426614174000",
+            "company_id": COMPANY_ID,
             "role_id": 1,
             "is_active": True,
             "is_verified": False
@@ -109,19 +122,15 @@ def test_import_json_partial_success(client):
     )
     # 207 Multi-Status expected if at least one record is valid
     assert response.status_code == 207
-    assert b"records imported" in response.data
-    assert b"errors" in response.data
+    body = response.get_data()
+    assert b"records imported" in body
+    assert b"errors" in body
 
 def test_import_csv_success(client):
     """
     Test importing valid CSV data via /import/csv.
     """
-    csv_content = (
-        "email,firstname,lastname,hashed_passwd,company_id,role_id,is_active,is_verified\n"
-        "user1@example.com,User,One,xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx,123e4567-e89b-12d3-a456-426614174000,1,True,False\n"
-        "user2@example.com,User,Two,yyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyyy,123e4567-e89b-12d3-a456-426614174000,1,True,False\n"
-    )
-    file_data = io.BytesIO(csv_content.encode("utf-8"))
+    file_data = io.BytesIO(USERS_CSV)
     response = client.post(
         "/import/csv",
         data={"file": (file_data, "users.csv")},
@@ -130,6 +139,40 @@ def test_import_csv_success(client):
     assert response.status_code == 200
     assert b"records imported successfully" in response.data
 
+def test_import_csv_spooled_upload(client, monkeypatch):
+    """
+    Test importing CSV data from an upload stream without readable(), like
+    the SpooledTemporaryFile werkzeug stores uploads in before Python 3.11,
+    with a quoted multi-line, non-ASCII field.
+    """
+    class SpooledFile:
+        """Upload container exposing only what Python 3.10 provides."""
+        def __init__(self):
+            self._file = io.BytesIO()
+            self.write = self._file.write
+            self.seek = self._file.seek
+            self.read = self._file.read
+            self.close = self._file.close
+
+        def __iter__(self):
+            return iter(self._file)
+
+    monkeypatch.setattr(
+        "werkzeug.wrappers.request.default_stream_factory",
+        lambda *args, **kwargs: SpooledFile()
+    )
+    data = (
+        CSV_HEADER +
+        f'user1@example.com,"Zoé\nAnne",One,{"x" * 56},{COMPANY_ID},1,True,False\n'
+    ).encode("utf-8")
+    response = client.post(
+        "/import/csv",
+        data={"file": (io.BytesIO(data), "users.csv")},
+        content_type="multipart/form-data"
+    )
+    assert response.status_code == 200
+    assert client.get("/users").get_json()[0]["firstname"] == "Zoé\nAnne"
+
 def test_import_csv_no_file(client):
     """
     Test importing with no file sent.
@@ -156,9 +199,9 @@ def test_import_csv_partial_success(client):
     Test importing a CSV with one valid and one invalid row.
     """
     csv_content = (
-        "email,firstname,lastname,hashed_passwd,company_id,role_id,is_active,is_verified\n"
-        "user1@example.com,User,One,xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx,123e4567-e89b-12d3-a456-426614174000,1,True,False\n"
-        ",User,NoEmail,xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx,123e4567-e89b-12d3-a456-426614174000,1,True,False\n"
+        CSV_HEADER +
+        f"user1@example.com,User,One,xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx,{COMPANY_ID},1,True,False\n"
+        f",User,NoEmail,xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx,{COMPANY_ID},1,True,False\n"
     )
     file_data = io.BytesIO(csv_content.encode("utf-8"))
     response = client.post(
@@ -168,5 +211,257 @@ def test_import_csv_partial_success(client):
     )
     # Should return 207 Multi-Status if at least one row is valid
     assert response.status_code == 207
-    assert b"records imported" in response.data
-    assert b"errors" in response.data
+    body = response.get_data()
+    assert b"records imported" in body
+    assert b"errors" in body
+
+@pytest.mark.parametrize("batch_size,workers", [(1000, 0), (1, 0), (1, 2)])
+def test_import_json_duplicate_email_in_file(
+    client, monkeypatch, batch_size, workers
+):
+    """
+    Test that an email listed twice in a file is rejected as not unique at
+    its second occurrence, whether the records share a batch, or sit in
+    batches validated together by worker processes.
+    """
+    monkeypatch.setattr("app.resources.import_from.BATCH_SIZE", batch_size)
+    monkeypatch.setitem(
+        client.application.config, "IMPORT_VALIDATION_WORKERS", workers
+    )
+    data = [
+        {
+            "email": "dup@example.com",
+            "firstname": "First",
+            "hashed_passwd": "x" * 60,
+            "company_id": COMPANY_ID,
+            "role_id": 1
+        },
+        {
+            "email": "dup@example.com",
+            "firstname": "Second",
+            "hashed_passwd": "x" * 60,
+            "company_id": COMPANY_ID,
+            "role_id": 1
+        }
+    ]
+    file_data = io.BytesIO(json.dumps(data).encode("utf-8"))
+    response = client.post(
+        "/import/json",
+        data={"file": (file_data, "users.json")},
+        content_type="multipart/form-data"
+    )
+    assert response.status_code == 207
+    assert response.json["errors"] == [
+        {"index": 1, "error": {"email": ["Email must be unique."]}}
+    ]
+    users = client.get("/users").get_json()
+    assert len(users) == 1
+    assert users[0]["firstname"] == "First"
+
+
+def test_import_json_truncated_array(client):
+    """
+    Test that a JSON array cut short is rejected without importing the items
+    parsed before the error.
+    """
+    content = json.dumps([{
+        "email": "user1@example.com",
+        "hashed_passwd": "x" * 60,
+        "company_id": COMPANY_ID,
+        "role_id": 1
+    }])[:-1] + ","
+    file_data = io.BytesIO(content.encode("utf-8"))
+    response = client.post(
+        "/import/json",
+        data={"file": (file_data, "users.json")},
+        content_type="multipart/form-data"
+    )
+    assert response.status_code == 400
+    assert b"Invalid JSON" in response.data
+    assert client.get("/users").get_json() == []
+
+def test_import_csv_invalid_utf8(client):
+    """
+    Test importing a CSV file that is not valid UTF-8.
+    """
+    file_data = io.BytesIO(b"email,firstname\n\xff\xfe@example.com,User\n")
+    response = client.post(
+        "/import/csv",
+        data={"file": (file_data, "users.csv")},
+        content_type="multipart/form-data"
+    )
+    assert response.status_code == 400
+    assert b"Invalid CSV file" in response.data
+
+def test_import_json_streaming(client, monkeypatch):
+    """
+    Test that uploads above the streaming threshold are parsed with ijson.
+    """
+    monkeypatch.setattr(
+        "app.resources.import_from.JSON_STREAMING_THRESHOLD", 0
+    )
+    data = [{
+        "email": "stream@example.com",
+        "hashed_passwd": "x" * 60,
+        "company_id": COMPANY_ID,
+        "role_id": 1
+    }]
+    file_data = io.BytesIO(json.dumps(data).encode("utf-8"))
+    response = client.post(
+        "/import/json",
+        data={"file": (file_data, "users.json")},
+        content_type="multipart/form-data"
+    )
+    assert response.status_code == 200
+    assert b"1 records imported successfully" in response.data
+
+    file_data = io.BytesIO(NOT_A_LIST_JSON)
+    response = client.post(
+        "/import/json",
+        data={"file": (file_data, "users.json")},
+        content_type="multipart/form-data"
+    )
+    assert response.status_code == 400
+    assert b"JSON must be a list of user objects" in response.data
+
+def test_import_json_existing_email_rejected(client, user):
+    """
+    Test that a record whose email already exists fails validation.
+    """
+    data = [{
+        "email": user.email,
+        "hashed_passwd": "x" * 60,
+        "company_id": COMPANY_ID,
+        "role_id": 1
+    }]
+    file_data = io.BytesIO(json.dumps(data).encode("utf-8"))
+    response = client.post(
+        "/import/json",
+        data={"file": (file_data, "users.json")},
+        content_type="multipart/form-data"
+    )
+    assert response.status_code == 400
+    assert b"Email must be unique" in response.data
+
+def test_import_json_existing_email_conflict(client, user, monkeypatch):
+    """
+    Test that a record whose email already exists is rejected by the
+    database, without changing that user, if it gets past the schema
+    uniqueness check.
+    """
+    # Let an existing email through the schema uniqueness check
+    monkeypatch.setattr(
+        "app.models.User.get_existing_emails", lambda emails: set()
+    )
+    data = [{
+        "email": user.email,
+        "firstname": "Imported",
+        "hashed_passwd": "x" * 60,
+        "company_id": COMPANY_ID,
+        "role_id": 2
+    }]
+    file_data = io.BytesIO(json.dumps(data).encode("utf-8"))
+    response = client.post(
+        "/import/json",
+        data={"file": (file_data, "users.json")},
+        content_type="multipart/form-data"
+    )
+    assert response.status_code == 400
+    assert response.json["errors"][0]["index"] == 0
+    users = client.get("/users").get_json()
+    assert len(users) == 1
+    assert users[0]["id"] == user.id
+    assert users[0]["firstname"] != "Imported"
+
+def test_import_json_integrity_error_fallback(client, monkeypatch):
+    """
+    Test that a record rejected by the database is reported with its index
+    while the other records of the batch are still imported.
+    """
+    # Skip validation so that a record without password reaches the database
+    monkeypatch.setattr(
+        "app.schemas.UserSchema.load",
+        lambda self, data, **kwargs: dict(data)
+    )
+    data = [
+        {
+            "email": "new@example.com",
+            "hashed_passwd": "x" * 60,
+            "company_id": COMPANY_ID,
+            "role_id": 1
+        },
+        {
+            "email": "nopassword@example.com",
+            "company_id": COMPANY_ID,
+            "role_id": 1
+        }
+    ]
+    file_data = io.BytesIO(json.dumps(data).encode("utf-8"))
+    response = client.post(
+        "/import/json",
+        data={"file": (file_data, "users.json")},
+        content_type="multipart/form-data"
+    )
+    assert response.status_code == 207
+    body = response.get_json()
+    assert body["message"] == "1 records imported, 1 errors"
+    assert body["errors"][0]["index"] == 1
+    emails = [u["email"] for u in client.get("/users").get_json()]
+    assert emails == ["new@example.com"]
+
+def test_import_json_validator_exception(client):
+    """
+    Test that a validator failing with an unexpected exception only rejects
+    its own record.
+    """
+    data = [
+        {
+            "email": "user1@example.com",
+            "hashed_passwd": "x" * 60,
+            "company_id": COMPANY_ID,
+            "role_id": 1
+        },
+        {
+            "email": "user2@example.com",
+            "hashed_passwd": "x" * 60,
+            "company_id": COMPANY_ID,
+            "role_id": 0
+        }
+    ]
+    file_data = io.BytesIO(json.dumps(data).encode("utf-8"))
+    response = client.post(
+        "/import/json",
+        data={"file": (file_data, "users.json")},
+        content_type="multipart/form-data"
+    )
+    assert response.status_code == 207
+    assert response.get_json()["errors"][0]["index"] == 1
+
+def test_import_json_validation_workers(client, monkeypatch):
+    """
+    Test that batches validated by worker processes are imported in order,
+    with errors reported at their index.
+    """
+    monkeypatch.setattr("app.resources.import_from.BATCH_SIZE", 2)
+    monkeypatch.setitem(client.application.config, "IMPORT_VALIDATION_WORKERS", 2)
+    data = [
+        {
+            "email": f"worker{i}@example.com",
+            "hashed_passwd": "x" * 60,
+            "company_id": COMPANY_ID,
+            "role_id": 1
+        }
+        for i in range(5)
+    ]
+    data[3]["email"] = "invalid"
+    file_data = io.BytesIO(json.dumps(data).encode("utf-8"))
+    response = client.post(
+        "/import/json",
+        data={"file": (file_data, "users.json")},
+        content_type="multipart/form-data"
+    )
+    assert response.status_code == 207
+    body = response.get_json()
+    assert body["message"] == "4 records imported, 1 errors"
+    assert [e["index"] for e in body["errors"]] == [3]
+    assert len(client.get("/users").get_json()) == 4
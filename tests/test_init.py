@@ -5,10 +5,20 @@ This module contains tests for the Flask application factory, error handlers, an
 It ensures that the app is created correctly, custom error handlers work as expected,
 and the main run logic is invoked properly.
 """
+import pytest
 from flask import Flask
 import app
 
 
+@pytest.fixture
+def own_client():
+    """
+    Test client of an application of its own, for tests that add routes or
+    change the configuration: the `app` fixture is shared by the session.
+    """
+    return app.create_app('app.config.TestingConfig').test_client()
+
+
 def test_main_runs(monkeypatch):
     """
     Test that the main run logic is called with the correct debug argument.
@@ -43,31 +53,110 @@ def test_handle_404(client):
     assert response.get_json()["message"] == "Resource not found"
 
 
-def test_error_handler_400(client):
+def test_error_handler_400(own_client):
     """
     Test that a 400 Bad Request error returns the correct JSON response.
     """
     from werkzeug.exceptions import BadRequest
 
-    @client.application.route("/bad")
+    @own_client.application.route("/bad")
     def bad():
         raise BadRequest()
 
-    response = client.get("/bad")
+    response = own_client.get("/bad")
     assert response.status_code == 400
     assert response.get_json() == {"message": "Bad request"}
 
 
-def test_error_handler_500(client):
+def test_error_handler_500(own_client):
     """
     Test that a 500 Internal Server Error returns the correct JSON response.
     """
     # Désactive la propagation pour tester le handler 500
-    client.application.config["PROPAGATE_EXCEPTIONS"] = False
+    own_client.application.config["PROPAGATE_EXCEPTIONS"] = False
 
-    @client.application.route("/fail")
+    @own_client.application.route("/fail")
     def fail():
         raise Exception("fail!")
-    response = client.get("/fail")
+    response = own_client.get("/fail")
     assert response.status_code == 500
     assert response.get_json() == {"message": "Internal server error"}
+
+
+def test_error_handler_method_not_allowed(client):
+    """
+    Test that other HTTP errors, such as 405, return a JSON message and
+    keep their headers.
+    """
+    response = client.delete("/users")
+    assert response.status_code == 405
+    assert "message" in response.get_json()
+    assert "GET" in response.headers["Allow"]
+
+
+def test_extensions_shared_between_apps(client, own_client):
+    """
+    Test that the applications of a process share one instance of each
+    extension, created with the first application.
+    """
+    assert app.migrate is not None and app.ma is not None
+    for flask_app in (client.application, own_client.application):
+        assert flask_app.extensions["migrate"].migrate is app.migrate
+
+
+def test_import_does_not_read_config():
+    """
+    Test that importing the package does not import the configuration
+    module, whose classes read the environment, so that an entry point can
+    still load its .env file afterwards.
+    """
+    import os
+    import subprocess
+    import sys
+
+    result = subprocess.run(
+        [sys.executable, "-c",
+         "import sys, app; print('app.config' in sys.modules)"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
+
+
+def test_create_app_requires_database_url(monkeypatch):
+    """
+    Test that create_app fails when DATABASE_URL is not set, while the
+    configuration module itself stays importable.
+    """
+    from app.config import TestingConfig
+
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    with pytest.raises(ValueError, match="DATABASE_URL"):
+        app.create_app(TestingConfig)
+
+
+def test_json_responses_use_orjson(client):
+    """
+    Test that JSON is parsed and served through the orjson provider.
+    """
+    from decimal import Decimal
+    from app.json_provider import OrjsonProvider
+
+    assert isinstance(client.application.json, OrjsonProvider)
+    assert client.application.json.loads(b'{"a": 1}') == {"a": 1}
+    assert client.application.json.dumps({"a": Decimal("1.5")}) == '{"a":"1.5"}'
+    response = client.get("/users")
+    assert response.status_code == 200
+    assert response.data == b"[]\n"
+
+
+def test_create_app_sets_log_level():
+    """
+    Test that create_app applies the LOG_LEVEL of its configuration to the
+    application logger.
+    """
+    import logging
+    from app.logger import logger
+
+    app.create_app('app.config.TestingConfig')
+    assert logger.level == logging.WARNING
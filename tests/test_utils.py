@@ -2,8 +2,17 @@ import os
 import uuid
 import pytest
 import requests_mock
+from app import utils
 from app.utils import check_company_id, check_role_id, require_internal
 
+
+@pytest.fixture(autouse=True)
+def clear_lookup_caches():
+    """
+    Start each test with empty company and role lookup caches.
+    """
+    utils._lookup_cache.cache_clear()
+
 def test_check_company_id_valid_uuid(monkeypatch):
     """
     Should return True for a valid UUID in testing environment.
@@ -55,6 +64,27 @@ def test_check_company_id_external_200(monkeypatch, requests_mock):
     requests_mock.get("http://company/companies/123e4567-e89b-12d3-a456-426614174000", status_code=200)
     assert check_company_id("123e4567-e89b-12d3-a456-426614174000") is True
 
+def test_check_company_id_cached(monkeypatch, requests_mock):
+    """
+    Should answer a repeated lookup from the cache, for VALIDATION_CACHE_TTL
+    seconds.
+    """
+    monkeypatch.setenv("FLASK_ENV", "production")
+    monkeypatch.setenv("COMPANY_SERVICE_URL", "http://company")
+    company = "123e4567-e89b-12d3-a456-426614174000"
+    found = requests_mock.get(
+        f"http://company/companies/{company}", status_code=200
+    )
+    assert check_company_id(company) is True
+    assert check_company_id(company) is True
+    assert found.call_count == 1
+
+    monkeypatch.setenv("VALIDATION_CACHE_TTL", "0")
+    utils._lookup_cache.cache_clear()
+    assert check_company_id(company) is True
+    assert check_company_id(company) is True
+    assert found.call_count == 3
+
 def test_check_role_id_valid(monkeypatch):
     """
     Should return True for a valid role ID in testing environment.
@@ -107,3 +137,164 @@ def test_check_role_id_external_200(monkeypatch, requests_mock):
     monkeypatch.setenv("ROLE_SERVICE_URL", "http://role")
     requests_mock.get("http://role/roles/1", status_code=200)
     assert check_role_id(1) is True
+
+def test_check_role_id_cached(monkeypatch, requests_mock):
+    """
+    Should only query the role service once for repeated found or not found
+    answers, and not cache server errors.
+    """
+    monkeypatch.setenv("FLASK_ENV", "production")
+    monkeypatch.setenv("ROLE_SERVICE_URL", "http://role")
+    found = requests_mock.get("http://role/roles/1", status_code=200)
+    missing = requests_mock.get("http://role/roles/2", status_code=404)
+    failing = requests_mock.get("http://role/roles/3", status_code=503)
+    assert check_role_id(1) is True
+    assert check_role_id(1) is True
+    assert found.call_count == 1
+    assert check_role_id(2) is False
+    assert check_role_id(2) is False
+    assert missing.call_count == 1
+    assert check_role_id(3) is False
+    assert check_role_id(3) is False
+    assert failing.call_count == 2
+
+def test_http_session_shared(monkeypatch):
+    """
+    Should build a single session for all lookups, its connection pool size
+    read from SERVICE_POOL_MAXSIZE.
+    """
+    monkeypatch.setenv("SERVICE_POOL_MAXSIZE", "7")
+    utils._http_session.cache_clear()
+    try:
+        session = utils._http_session()
+        assert utils._http_session() is session
+        assert session.get_adapter("https://role")._pool_maxsize == 7
+    finally:
+        utils._http_session.cache_clear()
+
+def test_prefetch_checks_fills_caches(monkeypatch, requests_mock):
+    """
+    Should look up each distinct ID once, so that the following checks are
+    answered from the caches.
+    """
+    monkeypatch.setenv("FLASK_ENV", "production")
+    monkeypatch.setenv("COMPANY_SERVICE_URL", "http://company")
+    monkeypatch.setenv("ROLE_SERVICE_URL", "http://role")
+    company = "123e4567-e89b-12d3-a456-426614174000"
+    company_call = requests_mock.get(
+        f"http://company/companies/{company}", status_code=200
+    )
+    role_call = requests_mock.get("http://role/roles/1", status_code=404)
+    utils.prefetch_checks({company, "not-a-uuid"}, {1})
+    assert company_call.call_count == 1
+    assert role_call.call_count == 1
+    assert check_company_id(company) is True
+    assert check_role_id(1) is False
+    assert company_call.call_count == 1
+    assert role_call.call_count == 1
+
+def test_password_needs_rehash(app, monkeypatch):
+    """
+    Should only ask for a new hash when the stored one was made with a
+    weaker method, including methods left to werkzeug's default parameters.
+    """
+    from werkzeug.security import generate_password_hash
+
+    method = app.config["PASSWORD_HASH_METHOD"]
+    assert not utils.password_needs_rehash(
+        generate_password_hash("secret", method=method)
+    )
+    assert utils.password_needs_rehash(
+        generate_password_hash("secret", method="pbkdf2:sha256:500")
+    )
+    assert not utils.password_needs_rehash(
+        generate_password_hash("secret", method="pbkdf2:sha256:2000")
+    )
+    assert not utils.password_needs_rehash(
+        generate_password_hash("secret", method="scrypt:1024:8:1")
+    )
+    assert not utils.password_needs_rehash("not-a-werkzeug-hash")
+    monkeypatch.setitem(app.config, "PASSWORD_HASH_METHOD", "scrypt")
+    assert not utils.password_needs_rehash(
+        generate_password_hash("secret", method="scrypt")
+    )
+    assert utils.password_needs_rehash(
+        generate_password_hash("secret", method="scrypt:1024:8:1")
+    )
+    assert utils.password_needs_rehash(
+        generate_password_hash("secret", method="pbkdf2:sha256:2000")
+    )
+
+def test_require_internal_production(monkeypatch):
+    """
+    Should check the internal token in production, against the secret read
+    when the view is decorated.
+    """
+    from flask import Flask
+
+    monkeypatch.setenv("FLASK_ENV", "production")
+    monkeypatch.setenv("INTERNAL_REQUEST_SECRET", "secret")
+    app = Flask(__name__)
+
+    @app.route("/internal")
+    @require_internal
+    def internal():
+        return "ok"
+
+    client = app.test_client()
+    assert client.get("/internal").status_code == 401
+    assert client.get(
+        "/internal", headers={"X-Internal-Token": "wrong"}
+    ).status_code == 401
+    assert client.get(
+        "/internal", headers={"X-Internal-Token": "secret"}
+    ).status_code == 200
+
+def test_require_internal_skipped(monkeypatch):
+    """
+    Should return the view unchanged outside production and staging, and
+    answer 500 when FLASK_ENV is not set.
+    """
+    from flask import Flask
+
+    def view():
+        return "ok"
+
+    monkeypatch.setenv("FLASK_ENV", "development")
+    assert require_internal(view) is view
+
+    monkeypatch.delenv("FLASK_ENV")
+    app = Flask(__name__)
+    app.add_url_rule("/internal", view_func=require_internal(view))
+    assert app.test_client().get("/internal").status_code == 500
+
+
+def test_check_skipped_logged_once(monkeypatch):
+    """
+    The skipped remote check is logged once per environment, not per call.
+    """
+    monkeypatch.setenv("FLASK_ENV", "testing")
+    logged = []
+    monkeypatch.setattr(utils.logger, "info", lambda *args: logged.append(args))
+    utils._log_skipped_check.cache_clear()
+    for _ in range(3):
+        assert check_company_id(str(uuid.uuid4())) is True
+        assert check_role_id(1) is True
+    assert len(logged) == 2
+
+def test_prefetch_checks_returns_errors(monkeypatch, requests_mock):
+    """
+    Should return the errors of the failed checks, which are not cached,
+    keyed by kind and ID.
+    """
+    from requests.exceptions import ConnectTimeout
+
+    monkeypatch.setenv("FLASK_ENV", "production")
+    monkeypatch.setenv("COMPANY_SERVICE_URL", "http://company")
+    monkeypatch.setenv("ROLE_SERVICE_URL", "http://role")
+    company = "123e4567-e89b-12d3-a456-426614174000"
+    requests_mock.get(f"http://company/companies/{company}", exc=ConnectTimeout)
+    requests_mock.get("http://role/roles/1", status_code=200)
+    errors = utils.prefetch_checks({company}, {1})
+    assert list(errors) == [("company", company)]
+    assert isinstance(errors[("company", company)], ValueError)
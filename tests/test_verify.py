@@ -1,27 +1,29 @@
-import json
-from app.models import User
 from werkzeug.security import generate_password_hash
+from app.config import TestingConfig
 
-def test_verify_password_success(client, monkeypatch):
+# Cheap hashes, those of TestingConfig: verifying a default-cost hash takes
+# as long as computing it
+HASH_METHOD = TestingConfig.PASSWORD_HASH_METHOD
+# Hash of "goodpassword", computed once for the module
+GOOD_HASH = generate_password_hash("goodpassword", method=HASH_METHOD)
+
+def test_verify_password_success(client, user_factory):
     """
     Test password verification with correct credentials.
     """
     # Create user in DB
-    user = User.create(
+    user = user_factory(
         email="verify@example.com",
-        hashed_passwd=generate_password_hash("goodpassword"),
+        hashed_passwd=GOOD_HASH,
         firstname="Verify",
-        lastname="User",
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1
+        lastname="User"
     )
     # Simulate internal auth header if needed by @require_internal
     headers = {"X-Internal-Auth": "1"}
     data = {"email": "verify@example.com", "password": "goodpassword"}
     response = client.post(
         "/users/verify_password",
-        data=json.dumps(data),
-        content_type="application/json",
+        json=data,
         headers=headers
     )
     assert response.status_code == 200
@@ -29,24 +31,77 @@ def test_verify_password_success(client, monkeypatch):
     assert response.json["user_id"] == user.id
     assert response.json["company_id"] == user.company_id
 
-def test_verify_password_wrong_password(client):
+def test_verify_password_upgrades_hash(client, user_factory):
+    """
+    Test that a password hashed with a weaker method than the configured
+    one is hashed again once verified, and still verifies afterwards.
+    """
+    old_hash = generate_password_hash("goodpassword", method="pbkdf2:sha256:500")
+    user = user_factory(email="legacy@example.com", hashed_passwd=old_hash)
+    data = {"email": "legacy@example.com", "password": "goodpassword"}
+    response = client.post("/users/verify_password", json=data)
+    assert response.status_code == 200
+    assert response.json["valid"] is True
+    method = client.application.config["PASSWORD_HASH_METHOD"]
+    assert user.hashed_passwd.startswith(method + "$")
+
+    response = client.post("/users/verify_password", json=data)
+    assert response.status_code == 200
+    assert user.hashed_passwd.startswith(method + "$")
+
+
+def test_verify_password_keeps_stronger_hash(client, user_factory):
+    """
+    Test that a password hashed with a stronger method than the configured
+    one, such as werkzeug's default scrypt, is not hashed again.
+    """
+    strong_hash = generate_password_hash(
+        "goodpassword", method="scrypt:1024:8:1"
+    )
+    user = user_factory(email="strong@example.com", hashed_passwd=strong_hash)
+    data = {"email": "strong@example.com", "password": "goodpassword"}
+    response = client.post("/users/verify_password", json=data)
+    assert response.status_code == 200
+    assert response.json["valid"] is True
+    assert user.hashed_passwd == strong_hash
+
+def test_verify_password_wrong_password(client, user_factory):
     """
     Test password verification with wrong password.
     """
-    User.create(
+    user_factory(
         email="wrongpass@example.com",
-        hashed_passwd=generate_password_hash("rightpassword"),
+        hashed_passwd=GOOD_HASH,
         firstname="Wrong",
-        lastname="Pass",
-        company_id="123e4567-e89b-12d3-a456-426614174000",
-        role_id=1
+        lastname="Pass"
     )
     headers = {"X-Internal-Auth": "1"}
     data = {"email": "wrongpass@example.com", "password": "badpassword"}
     response = client.post(
         "/users/verify_password",
-        data=json.dumps(data),
-        content_type="application/json",
+        json=data,
+        headers=headers
+    )
+    assert response.status_code == 401
+    assert response.json["valid"] is False
+
+def test_verify_password_empty_hash(client, user_factory, monkeypatch):
+    """
+    Test that a user without a password hash is rejected without hashing.
+    """
+    user_factory(email="nohash@example.com", hashed_passwd="")
+
+    def fail_check(*args):
+        raise AssertionError("check_password_hash should not be called")
+
+    monkeypatch.setattr(
+        "app.resources.verify.check_password_hash", fail_check
+    )
+    headers = {"X-Internal-Auth": "1"}
+    data = {"email": "nohash@example.com", "password": "any"}
+    response = client.post(
+        "/users/verify_password",
+        json=data,
         headers=headers
     )
     assert response.status_code == 401
@@ -60,8 +115,7 @@ def test_verify_password_user_not_found(client):
     data = {"email": "notfound@example.com", "password": "any"}
     response = client.post(
         "/users/verify_password",
-        data=json.dumps(data),
-        content_type="application/json",
+        json=data,
         headers=headers
     )
     assert response.status_code == 404
@@ -75,9 +129,78 @@ def test_verify_password_missing_fields(client):
     data = {"email": "missing@example.com"}
     response = client.post(
         "/users/verify_password",
-        data=json.dumps(data),
-        content_type="application/json",
+        json=data,
         headers=headers
     )
     assert response.status_code == 400
-    assert "message" in response.json
\ No newline at end of file
+    assert "message" in response.json
+
+
+def test_verify_password_cached_verdict(monkeypatch):
+    """
+    Test that repeated verifications of the same credentials only derive
+    the hash once, and that another stored hash is not served from cache.
+    """
+    from app.resources import verify
+
+    calls = []
+
+    def counting_check(hashed_passwd, password):
+        calls.append(password)
+        return password == "secret"
+
+    monkeypatch.setattr(verify, "check_password_hash", counting_check)
+    assert verify.verify_password("hash-a", "secret") is True
+    assert verify.verify_password("hash-a", "secret") is True
+    assert verify.verify_password("hash-a", "wrong") is False
+    assert verify.verify_password("hash-a", "wrong") is False
+    assert len(calls) == 2
+    verify.verify_password("hash-b", "secret")
+    assert len(calls) == 3
+
+def test_verify_password_batch(client, user_factory):
+    """
+    Test verifying several credentials in one request, with one verdict
+    per credential in the request order.
+    """
+    user = user_factory(email="batch1@example.com", hashed_passwd=GOOD_HASH)
+    user_factory(email="batch2@example.com", hashed_passwd="")
+    data = [
+        {"email": "batch1@example.com", "password": "goodpassword"},
+        {"email": "batch1@example.com", "password": "badpassword"},
+        {"email": "batch2@example.com", "password": "any"},
+        {"email": "notfound@example.com", "password": "any"},
+    ]
+    response = client.post("/users/verify_password_batch", json=data)
+    assert response.status_code == 200
+    assert response.json == [
+        {
+            "email": "batch1@example.com",
+            "valid": True,
+            "user_id": user.id,
+            "company_id": user.company_id,
+        },
+        {"email": "batch1@example.com", "valid": False},
+        {"email": "batch2@example.com", "valid": False},
+        {"email": "notfound@example.com", "valid": False},
+    ]
+
+def test_verify_password_batch_invalid(client, monkeypatch):
+    """
+    Test that a batch that is not a list of credentials, or is too long,
+    is rejected.
+    """
+    from app.resources import verify
+
+    for data in (
+        {"email": "x@example.com", "password": "any"},
+        [{"email": "x@example.com"}],
+    ):
+        response = client.post("/users/verify_password_batch", json=data)
+        assert response.status_code == 400
+        assert "message" in response.json
+
+    monkeypatch.setattr(verify, "VERIFY_BATCH_LIMIT", 1)
+    data = [{"email": "x@example.com", "password": "any"}] * 2
+    response = client.post("/users/verify_password_batch", json=data)
+    assert response.status_code == 400
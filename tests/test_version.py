@@ -5,8 +5,6 @@ This module contains tests for the /version endpoint to ensure it returns the
 correct version information.
 """
 
-import json
-
 def test_version_endpoint(client):
     """
     Test the /version endpoint to ensure it returns the correct version
@@ -16,6 +14,7 @@ def test_version_endpoint(client):
     response = client.get('/version')
     assert response.status_code == 200
 
-    data = json.loads(response.data)
+    data = response.get_json()
     assert isinstance(data, dict)
     assert "version" in data
+    assert response.mimetype == "application/json"
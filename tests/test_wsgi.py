@@ -1,50 +1,47 @@
 """
 test_wsgi.py
 ------------
-This module contains tests for the WSGI entrypoint to ensure the correct configuration
-class is selected based on the FLASK_ENV environment variable.
+This module contains tests for the WSGI entrypoint to ensure it exposes the
+application built for the FLASK_ENV environment variable, configured from its
+.env file.
 """
-import importlib
-import sys
 import os
-import pytest
+import subprocess
+import sys
 
-@pytest.mark.parametrize("env,expected_config", [
-    ("production", "app.config.ProductionConfig"),
-    ("staging", "app.config.StagingConfig"),
-    ("testing", "app.config.TestingConfig"),
-    ("development", "app.config.DevelopmentConfig"),
-    ("unknown", "app.config.DevelopmentConfig"),
-])
+from flask import Flask
+import wsgi
 
 
-def test_wsgi_config_class(monkeypatch, env, expected_config):
+def test_wsgi_exposes_app():
     """
-    Test that the WSGI entrypoint selects the correct configuration class
-    based on the FLASK_ENV environment variable.
-
-    This test patches load_dotenv and app.create_app to avoid side effects,
-    sets the FLASK_ENV, imports the wsgi module, and checks that the correct
-    config class is passed to create_app.
+    Test that the WSGI entrypoint exposes the application it built for the
+    WSGI server, with the configuration of the test environment.
     """
-    # Patch load_dotenv to avoid loading real .env files
-    monkeypatch.setattr("wsgi.load_dotenv", lambda *args, **kwargs: None)
-
-    # Patch app.create_app BEFORE importing wsgi
-    captured = {}
-    def fake_create_app(config_class):
-        captured["config_class"] = config_class
-        class DummyApp:
-            pass
-        return DummyApp()
-    monkeypatch.setattr("app.create_app", fake_create_app)
+    assert isinstance(wsgi.app, Flask)
+    assert wsgi.app.config["TESTING"] is True
 
-    if "wsgi" in sys.modules:
-        del sys.modules["wsgi"]
-    os.environ["FLASK_ENV"] = env
 
-    wsgi = importlib.import_module("wsgi")
-
-    assert hasattr(wsgi, "app")
-    assert "config_class" in captured, f"create_app was not called for env={env}"
-    assert captured["config_class"] == expected_config
+def test_wsgi_config_reads_dotenv(tmp_path):
+    """
+    Test that the configuration read by the WSGI entrypoint comes from the
+    .env file of the environment, which is loaded before the configuration
+    module is imported.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    (tmp_path / ".env.development").write_text(
+        "SECRET_KEY=from-dotenv\nDATABASE_URL=sqlite:///:memory:\n"
+    )
+    env = {
+        key: value for key, value in os.environ.items()
+        if key not in ("SECRET_KEY", "DATABASE_URL", "SKIP_DOTENV")
+    }
+    env["FLASK_ENV"] = "development"
+    env["PYTHONPATH"] = root
+
+    result = subprocess.run(
+        [sys.executable, "-c",
+         "import wsgi; print(wsgi.app.config['SECRET_KEY'])"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip().splitlines()[-1] == "from-dotenv"